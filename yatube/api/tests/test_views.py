@@ -0,0 +1,167 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import enforce_query_budgets
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+
+@enforce_query_budgets
+@override_settings(API_PAGE_SIZE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.author = User.objects.create_user(username='luigi')
+        cls.group = Group.objects.create(title='Грибы', slug='mushrooms',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text='Пост %s' % number)
+            for number in range(3)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data),
+                                content_type='application/json')
+
+    def test_posts_paginated_by_cursor(self):
+        """Список постов отдается страницами по курсору."""
+        url = reverse('api:post_list')
+        first = self.get(url)
+        second = self.get(url, cursor=first['next'])
+
+        self.assertEqual(
+            [post['id'] for post in first['results'] + second['results']],
+            [post.pk for post in self.posts]
+        )
+        self.assertIsNone(second['next'])
+        self.assertEqual(first['results'][0]['author'], 'luigi')
+        self.assertEqual(first['results'][0]['group'], 'mushrooms')
+
+    def test_sparse_fields(self):
+        """Параметр fields ограничивает набор полей."""
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        self.assertEqual(self.get(url, fields='id,text'),
+                         {'id': self.posts[0].pk, 'text': 'Пост 2'})
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_groups(self):
+        """Посты фильтруются по группе и автору, группы доступны списком."""
+        other = Post.objects.create(author=self.user, text='Без группы')
+        posts = self.get(reverse('api:post_list'), group='mushrooms',
+                         fields='id')['results']
+        self.assertNotIn({'id': other.pk}, posts)
+        posts = self.get(reverse('api:post_list'), author='mario',
+                         fields='id')['results']
+        self.assertEqual(posts, [{'id': other.pk}])
+
+        groups = self.get(reverse('api:group_list'))['results']
+        self.assertEqual([group['slug'] for group in groups], ['mushrooms'])
+        group = self.get(reverse('api:group_detail', args=('mushrooms',)))
+        self.assertEqual(group['title'], 'Грибы')
+
+    def test_comments(self):
+        """Комментарии создаются и читаются через API."""
+        url = reverse('api:comment_list', args=(self.posts[0].pk,))
+        response = self.post(url, {'text': 'Привет'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], 'mario')
+        self.assertEqual(self.get(url)['results'][0]['text'], 'Привет')
+        self.assertEqual(self.post(url, {'text': ''}).status_code, 400)
+        self.assertTrue(Comment.objects.filter(text='Привет').exists())
+
+    def test_follows(self):
+        """Подписки создаются, читаются и удаляются через API."""
+        url = reverse('api:follow_list')
+        self.assertEqual(self.post(url, {'author': 'luigi'}).status_code,
+                         201)
+        self.assertEqual(self.post(url, {'author': 'mario'}).status_code,
+                         400)
+        self.assertEqual(self.get(url)['results'][0]['author'], 'luigi')
+
+        response = self.client.delete(
+            reverse('api:follow_detail', args=('luigi',)))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
+    def test_bulk(self):
+        """Пачка постов и комментариев создается одним запросом."""
+        response = self.post(reverse('api:bulk'), {
+            'posts': [{'text': 'Первый', 'group': 'mushrooms'},
+                      {'text': 'Второй'}],
+            'comments': [{'post': self.posts[0].pk, 'text': 'Ура'}],
+        })
+
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual(len(created['posts']), 2)
+        self.assertEqual(
+            Post.objects.get(pk=created['posts'][0]).author, self.user)
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).comments_count, 1)
+
+    def test_bulk_all_or_nothing(self):
+        """Пачка с ошибкой не создает ничего."""
+        response = self.post(reverse('api:bulk'), {
+            'posts': [{'text': 'Первый'}, {'text': 'Плохой', 'group': 'no'}],
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('posts[1]', response.json()['errors'])
+        self.assertFalse(Post.objects.filter(text='Первый').exists())
+
+    def test_invalid_comment_messages(self):
+        """Ошибки формы отдаются с текстом сообщений."""
+        response = self.post(
+            reverse('api:comment_list', args=(self.posts[0].pk,)),
+            {'text': ''})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'],
+                         {'text': ['Обязательное поле.']})
+
+    def test_oversized_cursors(self):
+        """Курсор с pk больше 64 бит не приводит к 500."""
+        self.assertEqual(self.client.get(
+            reverse('api:group_list'),
+            {'cursor': '99999999999999999999999'}).status_code, 400)
+        self.assertEqual(self.client.get(
+            reverse('api:group_list'), {'cursor': '²'}).status_code, 400)
+        cursor = encode_cursor(self.posts[0].pub_date, 10 ** 26)
+        page = self.get(reverse('api:post_list'), cursor=cursor)
+        self.assertEqual(len(page['results']), 2)
+
+    def test_errors(self):
+        """Ошибки отдаются в JSON с нужным статусом."""
+        self.client.logout()
+        responses = {
+            reverse('api:post_detail', args=(999,)): 404,
+            reverse('api:comment_list', args=(999,)): 404,
+            reverse('api:follow_list'): 401,
+        }
+        for url, status in responses.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+        response = self.client.delete(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
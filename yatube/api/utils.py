@@ -0,0 +1,165 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+
+from posts.utils import MAX_PK, PREVIOUS, CursorPaginator, encode_cursor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def dumps(data):
+    """JSON в байтах: orjson, если установлен, иначе стандартный json."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, cls=DjangoJSONEncoder,
+                      ensure_ascii=False).encode()
+
+
+def api_response(data, status=200):
+    return HttpResponse(dumps(data), status=status,
+                        content_type='application/json')
+
+
+def api_view(*methods, login_required=False):
+    """
+    Разрешает только перечисленные методы и отдает ошибки в JSON.
+    С login_required гость получает 401, без него - только на запись.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise ApiError(405, 'Метод не поддерживается.')
+                if ((login_required or request.method != 'GET')
+                        and not request.user.is_authenticated):
+                    raise ApiError(401, 'Требуется авторизация.')
+                return view(request, *args, **kwargs)
+            except Http404:
+                return api_response({'error': 'Не найдено.'}, 404)
+            except ApiError as error:
+                return api_response({'error': error.message}, error.status)
+        return wrapper
+    return decorator
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, 'Тело запроса должно быть JSON.')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Тело запроса должно быть объектом JSON.')
+    return data
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    Публичные поля ресурса и пути к ним в ORM. Строки читаются через
+    values() одним запросом с JOIN по связям, без создания моделей.
+    Параметр ?fields=id,text ограничивает набор полей.
+    """
+
+    def __init__(self, fields, converters=None):
+        self.fields = fields
+        self.converters = converters or {}
+
+    def select(self, request):
+        requested = request.GET.get('fields')
+        if not requested:
+            return list(self.fields)
+        names = [name for name in requested.split(',') if name]
+        unknown = sorted(set(names) - set(self.fields))
+        if unknown:
+            raise ApiError(400, 'Неизвестные поля: {}.'.format(
+                ', '.join(unknown)))
+        return names
+
+    def values(self, queryset, names, *extra):
+        paths = {self.fields[name] for name in names}
+        return queryset.values(*paths.union(extra))
+
+    def serialize(self, row, names):
+        data = {}
+        for name in names:
+            value = row[self.fields[name]]
+            converter = self.converters.get(name)
+            data[name] = converter(value) if converter else value
+        return data
+
+    def one(self, request, queryset):
+        names = self.select(request)
+        row = self.values(queryset, names).first()
+        if row is None:
+            raise Http404
+        return self.serialize(row, names)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом.')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def cursor_page(request, queryset, resource, field='pub_date'):
+    """Страница списка по курсору (field, pk) и курсор следующей."""
+    names = resource.select(request)
+    per_page = page_size(request)
+    paginator = CursorPaginator(queryset, per_page, field=field)
+    queryset, direction, _ = paginator.keyset(request.GET.get('cursor'))
+    rows = list(resource.values(queryset, names, field, 'pk')
+                [:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREVIOUS:
+        rows.reverse()
+    next_cursor = None
+    if has_more or direction == PREVIOUS and rows:
+        next_cursor = encode_cursor(rows[-1][field], rows[-1]['pk'])
+    return {
+        'results': [resource.serialize(row, names) for row in rows],
+        'next': next_cursor,
+    }
+
+
+def pk_page(request, queryset, resource):
+    """Страница списка без даты: ключом служит pk, курсор - его значение."""
+    names = resource.select(request)
+    per_page = page_size(request)
+    cursor = request.GET.get('cursor')
+    queryset = queryset.order_by('pk')
+    if cursor:
+        try:
+            after = int(cursor)
+        except ValueError:
+            after = None
+        if after is None or not 0 <= after <= MAX_PK:
+            raise ApiError(400, 'Неверный курсор.')
+        queryset = queryset.filter(pk__gt=after)
+    rows = list(resource.values(queryset, names, 'pk')[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        'results': [resource.serialize(row, names) for row in rows],
+        'next': str(rows[-1]['pk']) if has_more else None,
+    }
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from core.metrics import query_budget
+from core.replicas import read_replica
+from posts import importer
+from posts.forms import CommentForm
+from posts.models import Comment, Follow, Group, Post
+from posts.object_cache import users
+
+from .utils import (ApiError, Resource, api_response, api_view, cursor_page,
+                    media_url, pk_page, read_json)
+
+POSTS = Resource({
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}, converters={'image': media_url})
+GROUPS = Resource({
+    'id': 'pk',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+})
+COMMENTS = Resource({
+    'id': 'pk',
+    'post': 'post',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+})
+FOLLOWS = Resource({
+    'id': 'pk',
+    'author': 'author__username',
+})
+
+
+@read_replica
+@query_budget(3)
+@api_view('GET')
+def post_list(request):
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    return api_response(cursor_page(request, posts, POSTS))
+
+
+@read_replica
+@query_budget(3)
+@api_view('GET')
+def post_detail(request, post_id):
+    return api_response(POSTS.one(request, Post.objects.filter(pk=post_id)))
+
+
+@read_replica
+@query_budget(3)
+@api_view('GET')
+def group_list(request):
+    return api_response(pk_page(request, Group.objects.all(), GROUPS))
+
+
+@read_replica
+@query_budget(3)
+@api_view('GET')
+def group_detail(request, slug):
+    return api_response(GROUPS.one(request, Group.objects.filter(slug=slug)))
+
+
+@query_budget(11)
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    if request.method == 'POST':
+        post = get_object_or_404(Post, pk=post_id)
+        form = CommentForm(read_json(request))
+        if not form.is_valid():
+            return api_response({'errors': {
+                field: list(errors) for field, errors in form.errors.items()
+            }}, 400)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        return api_response(
+            COMMENTS.one(request, Comment.objects.filter(pk=comment.pk)), 201)
+    comments = Comment.objects.filter(post_id=post_id)
+    page = cursor_page(request, comments, COMMENTS, field='created')
+    if not page['results'] and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return api_response(page)
+
+
+@query_budget(12)
+@api_view('GET', 'POST', login_required=True)
+def follow_list(request):
+    if request.method == 'POST':
+        author = users.get_or_404(
+            str(read_json(request).get('author', '')))
+        if author == request.user:
+            raise ApiError(400, 'Нельзя подписаться на себя.')
+        follow, created = Follow.objects.get_or_create(user=request.user,
+                                                       author=author)
+        return api_response(
+            FOLLOWS.one(request, Follow.objects.filter(pk=follow.pk)),
+            201 if created else 200)
+    return api_response(
+        pk_page(request, Follow.objects.filter(user=request.user), FOLLOWS))
+
+
+@query_budget(10)
+@api_view('DELETE', login_required=True)
+def follow_detail(request, username):
+    author = users.get_or_404(username)
+    deleted, _ = Follow.objects.filter(user=request.user,
+                                       author=author).delete()
+    if not deleted:
+        raise Http404
+    return HttpResponse(status=204)
+
+
+def bulk_records(request, data, kind, fields):
+    items = data.get(kind) or []
+    if not isinstance(items, list) or not all(
+            isinstance(item, dict) for item in items):
+        raise ApiError(400, '{} должен быть списком объектов.'.format(kind))
+    return [
+        ('{}[{}]'.format(kind, number),
+         dict({name: item.get(name) for name in fields},
+              author=request.user.username))
+        for number, item in enumerate(items)
+    ]
+
+
+@query_budget(20)
+@api_view('POST')
+def bulk(request):
+    """
+    Пачка постов и комментариев от имени пользователя: все или ничего.
+    Пишется через bulk_create, производные данные обновляются пачкой.
+    """
+    data = read_json(request)
+    records = (bulk_records(request, data, 'posts', ('text', 'group'))
+               + bulk_records(request, data, 'comments', ('post', 'text')))
+    if len(records) > settings.API_MAX_BULK_ITEMS:
+        raise ApiError(400, 'Не больше {} записей за раз.'.format(
+            settings.API_MAX_BULK_ITEMS))
+    with transaction.atomic():
+        posts, comments, errors = importer.prepare(records)
+        if errors:
+            return api_response({'errors': dict(errors)}, 400)
+        importer.write(posts, comments)
+    return api_response({
+        'posts': [post.pk for post in posts],
+        'comments': [comment.pk for comment in comments],
+    }, 201)
@@ -0,0 +1,245 @@
+import fcntl
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+SEQUENCE_KEY = 'l1-invalidations'
+INVALIDATED_KEY = 'l1-invalidated:{}'
+
+
+class LocalLRU:
+    """LRU в памяти процесса: хранит копии значений не дольше timeout."""
+
+    def __init__(self, max_entries, timeout):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=None):
+        lifetime = self.timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + lifetime, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на flock: каждый вход открывает файл заново,
+    поэтому потоки одного процесса тоже ждут друг друга.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        self.local.descriptor = descriptor
+
+    def __exit__(self, *exc_info):
+        os.close(self.local.descriptor)
+
+
+class TwoLevelCache(BaseCache):
+    """
+    Общий кэш L2 (файлы, Redis и т.п.) с локальным LRU L1 в процессе.
+    Каждая запись в L2 добавляет ключ в общий журнал под очередным
+    номером; процесс сверяет номер не реже раза в CHECK_INTERVAL секунд и
+    удаляет из L1 только записанные с тех пор ключи. Если журнал отстал
+    или потерян, L1 очищается целиком. Ключи с префиксами из SHARED_ONLY
+    (версии тегов, счетчики, блокировки) в L1 не попадают и всегда
+    читаются из L2.
+
+    Номера журнала и блокировки держатся на атомарных incr и add. У Redis
+    и Memcached они атомарны сами; у FileBasedCache это чтение и запись
+    файла, поэтому для него нужен LOCK_FILE - общий для всех процессов
+    файл, под flock на котором выполняются incr и add.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        l2_params = dict(options.get('L2', {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }))
+        backend = import_string(l2_params.pop('BACKEND'))
+        self.l2 = backend(l2_params.pop('LOCATION', ''), l2_params)
+        self.l1 = LocalLRU(options.get('L1_MAX_ENTRIES', 1000),
+                           options.get('L1_TIMEOUT', 60))
+        self.check_interval = options.get('CHECK_INTERVAL', 0.5)
+        self.shared_only = tuple(options.get('SHARED_ONLY', ()))
+        lock_file = options.get('LOCK_FILE')
+        self.atomic = FileLock(lock_file) if lock_file else nullcontext()
+        # Записи журнала живут дольше L1: кто отстал сильнее, у того
+        # L1 все равно устарел.
+        self.log_timeout = self.l1.timeout + self.check_interval + 60
+        self.token = uuid.uuid4().hex
+        self.seen = None
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def local(self, key):
+        return not key.startswith(self.shared_only)
+
+    def resolve_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def sync(self):
+        now = time.monotonic()
+        if (self.checked is not None
+                and now - self.checked < self.check_interval):
+            return
+        sequence = self.l2.get(SEQUENCE_KEY)
+        with self.lock:
+            seen, self.seen, self.checked = self.seen, sequence, now
+        if sequence == seen:
+            return
+        if (seen is None or sequence is None or sequence < seen
+                or sequence - seen > self.l1.max_entries):
+            self.l1.clear()
+            return
+        keys = [INVALIDATED_KEY.format(number)
+                for number in range(seen + 1, sequence + 1)]
+        logged = self.l2.get_many(keys)
+        if len(logged) < len(keys):
+            self.l1.clear()
+            return
+        for token, key in logged.values():
+            if token != self.token:
+                self.l1.delete(key)
+
+    def invalidate(self, key, version):
+        """Записывает ключ в журнал, чтобы другие процессы убрали его из L1."""
+        with self.atomic:
+            try:
+                number = self.l2.incr(SEQUENCE_KEY)
+            except ValueError:
+                self.l2.add(SEQUENCE_KEY, 0, None)
+                number = self.l2.incr(SEQUENCE_KEY)
+        self.l2.set(INVALIDATED_KEY.format(number),
+                    (self.token, self.make_key(key, version)),
+                    self.log_timeout)
+
+    def l1_get(self, key, version):
+        return self.l1.get(self.make_key(key, version))
+
+    def l1_set(self, key, value, version, timeout):
+        self.l1.set(self.make_key(key, version), value, timeout)
+
+    def l1_delete(self, key, version):
+        self.l1.delete(self.make_key(key, version))
+
+    def get(self, key, default=None, version=None):
+        if not self.local(key):
+            return self.l2.get(key, default, version)
+        self.sync()
+        value = self.l1_get(key, version)
+        if value is not None:
+            return value
+        value = self.l2.get(key, version=version)
+        if value is None:
+            return default
+        self.l1_set(key, value, version, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        if any(self.local(key) for key in keys):
+            self.sync()
+            for key in keys:
+                if self.local(key):
+                    value = self.l1_get(key, version)
+                    if value is not None:
+                        found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                if self.local(key):
+                    self.l1_set(key, value, version, None)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.resolve_timeout(timeout)
+        self.l2.set(key, value, timeout, version)
+        if self.local(key):
+            self.invalidate(key, version)
+            self.l1_set(key, value, version, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.atomic:
+            added = self.l2.add(key, value, self.resolve_timeout(timeout),
+                                version)
+        if added and self.local(key):
+            self.invalidate(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, self.resolve_timeout(timeout), version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version)
+        if self.local(key):
+            self.invalidate(key, version)
+            self.l1_delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self.atomic:
+            value = self.l2.incr(key, delta, version)
+        if self.local(key):
+            self.invalidate(key, version)
+            self.l1_delete(key, version)
+        return value
+
+    def has_key(self, key, version=None):
+        if self.local(key):
+            self.sync()
+            if self.l1_get(key, version) is not None:
+                return True
+        return self.l2.has_key(key, version)
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+        self.checked = None
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import db, metrics, replicas
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CONCURRENT_QUERIES_WORKERS,
+            thread_name_prefix='queries'
+        )
+    return _executor
+
+
+def gather(*calls):
+    """
+    Выполняет независимые функции (обычно запросы к базе) и возвращает их
+    результаты по порядку. С CONCURRENT_QUERIES первая выполняется в
+    текущем потоке, остальные параллельно в пуле, каждая со своим
+    соединением; выбор реплики и учет запросов переносятся в пул. Поток
+    пула занимает место в DB_ACTIVE_LIMIT, без свободного места функция
+    выполняется в текущем потоке.
+    """
+    if not settings.CONCURRENT_QUERIES or len(calls) < 2:
+        return [call() for call in calls]
+    state = replicas.snapshot()
+    request_metrics = metrics.current()
+
+    def run(call, release):
+        replicas.restore(state)
+        try:
+            if request_metrics is None:
+                return call(), replicas.snapshot()
+            with metrics.attach(request_metrics):
+                return call(), replicas.snapshot()
+        finally:
+            replicas.restore(dict.fromkeys(state, False))
+            close_old_connections()
+            release()
+
+    futures = []
+    for call in calls[1:]:
+        release = db.reserve()
+        futures.append(None if release is None
+                       else executor().submit(run, call, release))
+    results = [calls[0]()]
+    for call, future in zip(calls[1:], futures):
+        if future is None:
+            results.append(call())
+            continue
+        result, used = future.result()
+        results.append(result)
+        # Запись или чтение из реплики в пуле важны для ответа так же,
+        # как сделанные в потоке запроса.
+        replicas.restore({name: used[name] or replicas.snapshot()[name]
+                          for name in ('wrote', 'replica_used')})
+    return results
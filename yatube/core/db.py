@@ -0,0 +1,118 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from . import metrics
+
+_lock = threading.Lock()
+_limiter = None
+_stats = {'checkouts': 0, 'waited': 0, 'timeouts': 0, 'wait_ms': 0.0,
+          'max_wait_ms': 0.0}
+
+
+class LimitTimeout(Exception):
+    pass
+
+
+def limiter():
+    global _limiter
+    with _lock:
+        if _limiter is None or _limiter[0] != settings.DB_ACTIVE_LIMIT:
+            semaphore = threading.BoundedSemaphore(settings.DB_ACTIVE_LIMIT)
+            _limiter = (settings.DB_ACTIVE_LIMIT, semaphore)
+        return _limiter[1]
+
+
+def record_wait(seconds, acquired):
+    wait_ms = seconds * 1000
+    with _lock:
+        _stats['checkouts'] += acquired
+        _stats['timeouts'] += not acquired
+        _stats['waited'] += wait_ms >= 1
+        _stats['wait_ms'] += wait_ms
+        _stats['max_wait_ms'] = max(_stats['max_wait_ms'], wait_ms)
+    metrics.record_db_wait(seconds)
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+@contextmanager
+def checkout():
+    """
+    Место среди DB_ACTIVE_LIMIT потоков, работающих с базой одновременно.
+    Это не пул: соединения остаются у потоков (CONN_MAX_AGE), и открытых
+    соединений столько, сколько потоков у сервера и у пула gather. Лимит
+    ограничивает, сколько из них заняты запросами в один момент.
+    """
+    semaphore = limiter()
+    started = time.perf_counter()
+    acquired = semaphore.acquire(timeout=settings.DB_ACTIVE_TIMEOUT)
+    record_wait(time.perf_counter() - started, acquired)
+    if not acquired:
+        raise LimitTimeout
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def reserve():
+    """
+    Место для потока пула gather без ожидания: поток запроса уже держит
+    свое, и ожидание второго может заблокировать оба. Возвращает функцию,
+    освобождающую место, или None, если мест нет.
+    """
+    if settings.DB_ACTIVE_LIMIT is None:
+        return lambda: None
+    semaphore = limiter()
+    if not semaphore.acquire(blocking=False):
+        return None
+    return semaphore.release
+
+
+class DatabaseLimitMiddleware:
+    """
+    Запрос занимает место в checkout() на все время обработки; если мест
+    нет дольше DB_ACTIVE_TIMEOUT, ответ 503.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.DB_ACTIVE_LIMIT is None:
+            return self.get_response(request)
+        try:
+            with checkout():
+                return self.get_response(request)
+        except LimitTimeout:
+            response = HttpResponse('База данных перегружена', status=503)
+            response['Retry-After'] = 1
+            return response
+
+
+def check_connections(**kwargs):
+    """
+    Проверяет постоянные соединения перед запросом не чаще раза в
+    DB_HEALTH_CHECK_INTERVAL секунд и закрывает оборванные.
+    """
+    interval = settings.DB_HEALTH_CHECK_INTERVAL
+    if interval is None:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        checked = getattr(connection, 'health_checked_at', None)
+        if checked is not None and now - checked < interval:
+            continue
+        connection.health_checked_at = now
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Счетчики одного запроса: SQL, шаблоны и события кэша."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.db_wait = 0.0
+        self.cache = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'db_wait_ms': round(self.db_wait * 1000, 2),
+            'cache': dict(self.cache),
+        }
+
+    def server_timing(self, total):
+        timings = [
+            'db;dur={:.2f};desc="{} queries"'.format(
+                self.sql_time * 1000, self.queries),
+            'tpl;dur={:.2f}'.format(self.template_time * 1000),
+            'dbwait;dur={:.2f}'.format(self.db_wait * 1000),
+        ]
+        timings.extend('cache-{};desc="{}"'.format(event, hits)
+                       for event, hits in sorted(self.cache.items()))
+        timings.append('total;dur={:.2f}'.format(total * 1000))
+        return ', '.join(timings)
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def attach(metrics):
+    """Считает запросы и события текущего потока в metrics."""
+    previous = current()
+    _local.metrics = metrics
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            yield metrics
+    finally:
+        _local.metrics = previous
+
+
+def collect():
+    return attach(RequestMetrics())
+
+
+def record_cache(event):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[event] += 1
+
+
+def record_template(seconds):
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += seconds
+
+
+def record_db_wait(seconds):
+    metrics = current()
+    if metrics is not None:
+        metrics.db_wait += seconds
+
+
+def query_budget(limit):
+    """
+    Сколько запросов к базе может сделать view за один запрос, включая
+    сессию и пользователя. Проверяет RequestMetricsMiddleware.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
@@ -0,0 +1,45 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает запросы к базе, время SQL и шаблонов и события кэша, отдает
+    их в заголовке Server-Timing и в логе и проверяет бюджет запросов view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.collect() as collected:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = collected.server_timing(total)
+        record = collected.as_dict()
+        record.update({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+        })
+        logger.info(json.dumps(record, ensure_ascii=False))
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and collected.queries > budget:
+            message = '{} {}: {} запросов при бюджете {}'.format(
+                request.method, request.path, collected.queries, budget)
+            if settings.QUERY_BUDGET_RAISE:
+                raise metrics.QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,83 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def read_replica(view):
+    """Чтения этого view идут в реплику, если пользователь не закреплен."""
+    view.use_replica = True
+    return view
+
+
+def replica_used():
+    return getattr(_state, 'replica_used', False)
+
+
+def snapshot():
+    """Состояние маршрутизации потока, чтобы перенести его в другой поток."""
+    return {name: getattr(_state, name, False)
+            for name in ('read_only', 'wrote', 'replica_used')}
+
+
+def restore(state):
+    for name, value in state.items():
+        setattr(_state, name, value)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if not getattr(_state, 'read_only', False):
+            # Явно основная база: иначе Django возьмет базу из подсказки,
+            # и связи объекта, прочитанного из реплики (например, из кэша
+            # объектов), читались бы из нее и у закрепленного пользователя.
+            return DEFAULT_DB_ALIAS
+        _state.replica_used = True
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Включает чтение из реплик для view с read_replica. После записи
+    пользователь на REPLICA_PIN_SECONDS закрепляется за основной базой,
+    чтобы видеть свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.read_only = _state.wrote = _state.replica_used = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.read_only = _state.wrote = _state.replica_used = False
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.read_only = (getattr(view_func, 'use_replica', False)
+                            and PIN_COOKIE not in request.COOKIES)
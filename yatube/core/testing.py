@@ -0,0 +1,5 @@
+from django.test import override_settings
+
+# Класс или тест с этим декоратором падает, если view превысил бюджет
+# запросов, объявленный через core.metrics.query_budget.
+enforce_query_budgets = override_settings(QUERY_BUDGET_RAISE=True)
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.test import TransactionTestCase
+
+SCOPE = {
+    'type': 'http',
+    'http_version': '1.1',
+    'method': 'GET',
+    'scheme': 'http',
+    'path': '/',
+    'root_path': '',
+    'query_string': b'',
+    'headers': [(b'host', b'testserver')],
+    'server': ('testserver', 80),
+}
+
+
+async def call(application):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(dict(SCOPE), receive, send)
+    return messages
+
+
+@skipUnless(find_spec('asgiref'), 'нужен asgiref')
+class AsgiTest(TransactionTestCase):
+    def test_index(self):
+        """Приложение ASGI отдает главную страницу."""
+        from yatube.asgi import application
+
+        messages = asyncio.run(call(application))
+
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertEqual(messages[0]['status'], 200)
+
+    def test_requests_overlap(self):
+        """Одновременные запросы выполняются в разных потоках параллельно."""
+        from yatube.asgi import ThreadedWsgiToAsgi
+        threads = set()
+
+        def slow_app(environ, start_response):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.2)
+            start_response('200 OK', [])
+            return [b'ok']
+
+        async def run_all():
+            application = ThreadedWsgiToAsgi(slow_app, threads=4)
+            return await asyncio.gather(*[call(application)
+                                          for _ in range(4)])
+
+        started = time.monotonic()
+        asyncio.run(run_all())
+
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(len(threads), 4)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from ..caches import SEQUENCE_KEY, TwoLevelCache
+
+
+def worker_cache():
+    """Кэш отдельного процесса: L2 общий, L1 свой."""
+    return TwoLevelCache('', {'OPTIONS': {
+        'L2': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'two-level-test',
+        },
+        'CHECK_INTERVAL': 0,
+        'SHARED_ONLY': ('shared:',),
+    }})
+
+
+def file_worker_cache(location):
+    """Кэш процесса с L2 на файлах и общим файлом блокировки."""
+    return TwoLevelCache('', {'OPTIONS': {
+        'L2': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        },
+        'LOCK_FILE': os.path.join(location, 'atomic.lock'),
+        'CHECK_INTERVAL': 0,
+    }})
+
+
+class TwoLevelCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.first = worker_cache()
+        self.second = worker_cache()
+        self.first.clear()
+
+    def test_l2_shared_between_workers(self):
+        """Запись одного процесса видна другому."""
+        self.first.set('page', 'v1')
+
+        self.assertEqual(self.second.get('page'), 'v1')
+
+    def test_invalidation_reaches_l1(self):
+        """Изменение и удаление сбрасывают L1 других процессов."""
+        self.first.set('page', 'v1')
+        self.second.get('page')
+
+        self.first.set('page', 'v2')
+        self.assertEqual(self.second.get('page'), 'v2')
+
+        self.first.delete('page')
+        self.assertIsNone(self.second.get('page'))
+
+    def test_invalidation_is_per_key(self):
+        """Запись одного ключа не сбрасывает остальные ключи в L1."""
+        self.first.set('page', 'v1')
+        self.first.set('fragment', 'f1')
+        self.second.get_many(['page', 'fragment'])
+        self.second.l2.delete('fragment')
+
+        self.first.set('page', 'v2')
+        self.assertEqual(self.second.get('page'), 'v2')
+        self.assertEqual(self.second.get('fragment'), 'f1')
+
+    def test_lost_log_clears_l1(self):
+        """Если журнал потерян, L1 очищается целиком."""
+        self.first.set('page', 'v1')
+        self.second.get('page')
+
+        self.first.set('page', 'v2')
+        self.first.l2.delete('l1-invalidated:2')
+        self.assertEqual(self.second.get('page'), 'v2')
+
+    def test_l1_serves_without_l2(self):
+        """Прочитанное значение отдается из L1."""
+        self.first.set('page', 'v1')
+        self.second.get('page')
+        self.second.l2.delete('page')
+
+        self.assertEqual(self.second.get('page'), 'v1')
+
+    def test_shared_only_keys_skip_l1(self):
+        """Ключи из SHARED_ONLY всегда читаются из L2."""
+        self.first.set('shared:version', 1)
+        self.second.get('shared:version')
+        self.first.incr('shared:version')
+
+        self.assertEqual(self.second.get_many(['shared:version']),
+                         {'shared:version': 2})
+
+    def test_values_are_copies(self):
+        """Изменение полученного объекта не портит L1."""
+        self.first.set('page', {'a': 1})
+        self.first.get('page')['a'] = 2
+
+        self.assertEqual(self.first.get('page'), {'a': 1})
+
+    def test_file_l2_allocates_unique_slots(self):
+        """Параллельные записи в файловый L2 не теряют номера журнала."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        workers = [file_worker_cache(location) for _ in range(8)]
+        start = threading.Barrier(len(workers))
+
+        def write(cache, number):
+            start.wait()
+            for step in range(20):
+                cache.set('page-%s-%s' % (number, step), step)
+
+        threads = [threading.Thread(target=write, args=(cache, number))
+                   for number, cache in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        logged = workers[0].l2.get_many(
+            ['l1-invalidated:%s' % number for number in range(1, 161)])
+        self.assertEqual(workers[0].l2.get(SEQUENCE_KEY), 160)
+        self.assertEqual(len({key for _, key in logged.values()}), 160)
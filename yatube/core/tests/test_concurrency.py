@@ -0,0 +1,104 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+from .. import db, metrics, replicas
+from ..concurrency import gather
+
+User = get_user_model()
+
+
+@override_settings(CONCURRENT_QUERIES=True)
+class GatherTest(TransactionTestCase):
+    def test_results_in_order(self):
+        """Результаты возвращаются в порядке функций, а не завершения."""
+        self.assertEqual(gather(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3])
+
+    def test_runs_in_pool(self):
+        """Все функции, кроме первой, выполняются в других потоках."""
+        names = gather(*[lambda: threading.current_thread().name] * 3)
+
+        self.assertEqual(names[0], threading.current_thread().name)
+        self.assertTrue(all(name.startswith('queries')
+                            for name in names[1:]))
+
+    @override_settings(CONCURRENT_QUERIES=False)
+    def test_disabled(self):
+        """Без настройки функции выполняются в текущем потоке."""
+        names = gather(*[lambda: threading.current_thread().name] * 2)
+        self.assertEqual(set(names), {threading.current_thread().name})
+
+    @override_settings(DB_ACTIVE_LIMIT=1)
+    def test_active_limit_respected(self):
+        """Без свободного места у базы функции выполняются в текущем потоке."""
+        with db.checkout():
+            names = gather(*[lambda: threading.current_thread().name] * 3)
+
+        self.assertEqual(set(names), {threading.current_thread().name})
+
+    @override_settings(DB_ACTIVE_LIMIT=2)
+    def test_active_limit_released(self):
+        """Потоки пула возвращают места у базы."""
+        gather(*[lambda: None] * 3)
+
+        semaphore = db.limiter()
+        acquired = [semaphore.acquire(blocking=False) for _ in range(2)]
+        for _ in filter(None, acquired):
+            semaphore.release()
+        self.assertEqual(acquired, [True, True])
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_replica_state_carried(self):
+        """Потоки пула читают из реплики, если из нее читает запрос."""
+        replicas.restore({'read_only': True})
+        try:
+            aliases = gather(lambda: None,
+                             lambda: router.db_for_read(Post))
+            self.assertEqual(aliases[1], 'replica1')
+            self.assertTrue(replicas.replica_used())
+        finally:
+            replicas.restore(dict.fromkeys(replicas.snapshot(), False))
+
+    def test_metrics_carried(self):
+        """Запросы из пула учитываются в метриках запроса."""
+        with metrics.collect() as collected:
+            gather(lambda: None, lambda: list(Post.objects.all()))
+        self.assertEqual(collected.queries, 1)
+
+    def test_profile(self):
+        """Профиль собирается из параллельных запросов."""
+        author = User.objects.create_user(username='mario')
+        reader = User.objects.create_user(username='luigi')
+        Post.objects.create(author=author, text='Пост')
+        self.client.force_login(reader)
+
+        response = self.client.get(reverse('posts:profile',
+                                           args=['mario']))
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(response.context['following'])
+
+    def test_group_and_post_detail(self):
+        """Страницы группы и поста собираются из параллельных запросов."""
+        author = User.objects.create_user(username='mario')
+        group = Group.objects.create(title='Грибы', slug='mushrooms',
+                                     description='Описание')
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        Comment.objects.create(post=post, author=author, text='Комментарий')
+
+        response = self.client.get(reverse('posts:group_posts',
+                                           args=['mushrooms']))
+        self.assertEqual(response.context['group'], group)
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[post.pk]))
+        self.assertEqual(response.context['post'], post)
+        self.assertEqual(len(response.context['comments']), 1)
+        self.assertEqual(self.client.get(reverse(
+            'posts:post_detail', args=[post.pk + 1])).status_code, 404)
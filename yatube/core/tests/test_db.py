@@ -0,0 +1,23 @@
+from django.test import TestCase, override_settings
+
+from .. import db
+
+
+@override_settings(DB_ACTIVE_LIMIT=1, DB_ACTIVE_TIMEOUT=0.01)
+class DatabaseLimitTest(TestCase):
+    def test_wait_in_server_timing(self):
+        """Время ожидания места у базы попадает в Server-Timing."""
+        response = self.client.get('/')
+
+        self.assertIn('dbwait;dur=', response['Server-Timing'])
+
+    def test_full_limit_gives_503(self):
+        """Если мест нет дольше DB_ACTIVE_TIMEOUT, ответ 503."""
+        timeouts = db.stats()['timeouts']
+
+        with db.checkout():
+            response = self.client.get('/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(db.stats()['timeouts'], timeouts + 1)
+        self.assertEqual(self.client.get('/').status_code, 200)
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..metrics import QueryBudgetExceeded, query_budget
+from ..middleware import RequestMetricsMiddleware
+
+User = get_user_model()
+
+
+@query_budget(1)
+def two_queries(request):
+    User.objects.exists()
+    User.objects.count()
+    return HttpResponse()
+
+
+def call(view):
+    request = RequestFactory().get('/')
+
+    def get_response(request):
+        middleware.process_view(request, view, (), {})
+        return view(request)
+
+    middleware = RequestMetricsMiddleware(get_response)
+    return middleware(request)
+
+
+class RequestMetricsTest(TestCase):
+    def test_server_timing_header(self):
+        """Ответ несет число запросов и время SQL в Server-Timing."""
+        response = self.client.get('/')
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('queries', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    def test_budget_logged_by_default(self):
+        """Превышение бюджета вне тестов только пишется в лог."""
+        with self.assertLogs('core.middleware', 'WARNING'):
+            response = call(two_queries)
+
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_budget_fails_tests(self):
+        """С enforce_query_budgets превышение бюджета роняет тест."""
+        with self.assertRaises(QueryBudgetExceeded):
+            call(two_queries)
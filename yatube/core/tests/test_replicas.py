@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..replicas import PIN_COOKIE, ReplicaMiddleware, read_replica
+
+User = get_user_model()
+
+
+@read_replica
+def read_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+def write_view(request):
+    router.db_for_write(Post)
+    return HttpResponse(router.db_for_read(Post))
+
+
+def call(view, **cookies):
+    request = RequestFactory().get('/')
+    request.COOKIES.update(cookies)
+
+    def get_response(request):
+        middleware.process_view(request, view, (), {})
+        return view(request)
+
+    middleware = ReplicaMiddleware(get_response)
+    return middleware(request)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def test_read_views_use_replica(self):
+        """Чтения view с read_replica уходят в реплику."""
+        self.assertEqual(call(read_view).content, b'replica1')
+
+    def test_other_views_use_primary(self):
+        """Остальные view читают из основной базы."""
+        self.assertEqual(call(write_view).content, b'default')
+
+    def test_write_pins_to_primary(self):
+        """После записи пользователь читает из основной базы."""
+        response = call(write_view)
+        pinned = call(read_view, **{PIN_COOKIE: '1'})
+
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(pinned.content, b'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик все идет в основную базу и куки не ставятся."""
+        response = call(write_view)
+
+        self.assertEqual(call(read_view).content, b'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaDatabaseTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика - отдельное соединение с той же тестовой базой, как
+        # зеркало; в настройках сайта ее нет.
+        connections.databases['replica'] = dict(
+            connections['default'].settings_dict)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='mario')
+        self.client.force_login(User.objects.get(username='mario'))
+        self.url = reverse('posts:profile', args=['mario'])
+
+    def get(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(self.url)
+        return response, len(replica)
+
+    def test_read_after_write_pinned(self):
+        """После записи страницы читаются из основной базы, пока есть кука."""
+        _, replica_queries = self.get()
+        self.assertGreater(replica_queries, 0)
+
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response, replica_queries = self.get()
+        self.assertEqual(replica_queries, 0)
+        self.assertContains(response, 'Новый пост')
+
+        del self.client.cookies[PIN_COOKIE]
+        cache.clear()
+        _, replica_queries = self.get()
+        self.assertGreater(replica_queries, 0)
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'queue', 'status', 'attempts', 'run_at',
+                    'locked_by')
+    list_filter = ('status', 'queue', 'name')
+    search_fields = ('name', 'key')
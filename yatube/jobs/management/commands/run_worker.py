@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди в нескольких потоках или '
+            'процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--processes', type=int, default=1,
+                            help='запустить столько процессов-обработчиков')
+        parser.add_argument('--queues', nargs='+',
+                            help='по умолчанию - все очереди')
+        parser.add_argument('--poll-interval', type=float)
+        parser.add_argument('--once', action='store_true',
+                            help='выйти, когда очередь опустеет')
+
+    def handle(self, *args, threads, processes, queues, poll_interval, once,
+               **options):
+        if processes > 1:
+            command = [sys.executable, sys.argv[0], 'run_worker',
+                       '--threads', str(threads)]
+            if queues:
+                command += ['--queues', *queues]
+            if poll_interval is not None:
+                command += ['--poll-interval', str(poll_interval)]
+            if once:
+                command.append('--once')
+            self.run_processes(processes, command)
+            return
+        worker = Worker(threads, queues, poll_interval, once)
+        try:
+            processed = worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+            processed = worker.processed
+        self.stdout.write('Выполнено задач: {}'.format(processed))
+
+    def run_processes(self, processes, command):
+        children = [subprocess.Popen(command) for _ in range(processes)]
+        try:
+            for child in children:
+                child.wait()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+            for child in children:
+                child.wait()
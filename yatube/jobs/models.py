@@ -0,0 +1,49 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job(models.Model):
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    queue = models.CharField('Очередь', max_length=50, default='default')
+    payload = models.TextField('Аргументы', default='{}')
+    key = models.CharField('Ключ идемпотентности', max_length=200,
+                           null=True, blank=True)
+    status = models.CharField('Статус', max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Попыток всего',
+                                                    default=3)
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    locked_at = models.DateTimeField('Взята', null=True, blank=True)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        constraints = (
+            models.UniqueConstraint(fields=['key'],
+                                    condition=Q(status=PENDING),
+                                    name='unique_pending_job_key'),
+        )
+        indexes = (
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        )
+
+    def __str__(self) -> str:
+        return '{} ({})'.format(self.name, self.status)
@@ -0,0 +1,212 @@
+import json
+import logging
+import random
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, OperationalError, connections,
+                       router, transaction)
+from django.db.models import Count, IntegerField, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DONE, FAILED, PENDING, RUNNING, Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def enqueue(name, args=(), kwargs=None, key=None, queue='default',
+            max_attempts=None, delay=0):
+    """
+    Ставит задачу в очередь в текущей транзакции: обработчик увидит ее
+    только после коммита. Если задача с тем же ключом еще ждет в очереди,
+    новая не создается. С TASKS_ALWAYS_EAGER задача выполняется сразу.
+    """
+    kwargs = kwargs or {}
+    if settings.TASKS_ALWAYS_EAGER:
+        REGISTRY[name](*args, **kwargs)
+        return
+    job = Job(
+        name=name,
+        queue=queue,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+        key=key,
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+    else:
+        # Повтор по ключу отбрасывает частичный уникальный индекс, без
+        # точки сохранения и лишних запросов.
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+
+
+def task(queue='default', max_attempts=None):
+    """
+    Регистрирует функцию как задачу. Вызов func.delay(*args, key=...)
+    ставит ее в очередь; аргументы должны сериализоваться в JSON, поэтому
+    передаются id, а не объекты.
+    """
+    def decorator(func):
+        name = '{}.{}'.format(func.__module__, func.__name__)
+        REGISTRY[name] = func
+
+        def delay(*args, key=None, **kwargs):
+            return enqueue(name, args, kwargs, key=key, queue=queue,
+                           max_attempts=max_attempts)
+
+        func.delay = delay
+        func.task_name = name
+        return func
+    return decorator
+
+
+def busy_queues(stale):
+    """
+    Очереди, где выполняется не меньше задач, чем разрешено. Это только
+    отсев: сам лимит проверяет UPDATE в take().
+    """
+    limits = settings.TASKS_CONCURRENCY
+    if not limits:
+        return []
+    running = (Job.objects
+               .filter(status=RUNNING, queue__in=limits, locked_at__gte=stale)
+               .values('queue').annotate(total=Count('pk')))
+    return [row['queue'] for row in running
+            if row['total'] >= limits[row['queue']]]
+
+
+def running_count(queue, stale):
+    return Coalesce(Subquery(
+        Job.objects
+        .filter(status=RUNNING, queue=queue, locked_at__gte=stale)
+        .order_by().values('queue').annotate(total=Count('pk'))
+        .values('total')
+    ), 0, output_field=IntegerField())
+
+
+def take(job, worker, now, stale):
+    """
+    Забирает задачу, если ее статус не изменился. Для очереди с лимитом
+    число выполняющихся задач считается в том же UPDATE: SQLite
+    выполняет записи по одной, а в PostgreSQL UPDATE очереди идут под
+    advisory-блокировкой до конца транзакции.
+    """
+    jobs = Job.objects.filter(pk=job.pk, status=job.status,
+                              locked_at=job.locked_at)
+    limit = (settings.TASKS_CONCURRENCY or {}).get(job.queue)
+    if limit is None:
+        return jobs.update(status=RUNNING, locked_at=now, locked_by=worker,
+                           attempts=job.attempts + 1)
+    jobs = (jobs.annotate(running=running_count(job.queue, stale))
+            .filter(running__lt=limit))
+    connection = connections[router.db_for_write(Job)]
+    with transaction.atomic(using=connection.alias):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                               [zlib.crc32(job.queue.encode())])
+        return jobs.update(status=RUNNING, locked_at=now, locked_by=worker,
+                           attempts=job.attempts + 1)
+
+
+def claim(worker, queues=None):
+    """
+    Берет одну готовую задачу. Задачу забирает тот, чей UPDATE с прежним
+    статусом прошел первым, поэтому обработчики не делят задачи без
+    блокировок. Зависшие дольше TASKS_LOCK_TIMEOUT задачи берутся заново.
+    Лимит TASKS_CONCURRENCY проверяется тем же UPDATE.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    jobs = Job.objects.filter(
+        Q(status=PENDING, run_at__lte=now)
+        | Q(status=RUNNING, locked_at__lt=stale)
+    ).exclude(queue__in=busy_queues(stale)).order_by('run_at', 'pk')
+    if queues:
+        jobs = jobs.filter(queue__in=queues)
+    for job in jobs[:10]:
+        if take(job, worker, now, stale):
+            job.status, job.locked_at, job.locked_by = RUNNING, now, worker
+            job.attempts += 1
+            return job
+    return None
+
+
+def retry_delay(attempts):
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def owned(job):
+    """Задача, пока ее не забрал другой обработчик после TASKS_LOCK_TIMEOUT."""
+    return Job.objects.filter(pk=job.pk, locked_at=job.locked_at)
+
+
+def fail(job, error):
+    if job.attempts >= job.max_attempts:
+        owned(job).update(status=FAILED, last_error=error)
+        return
+    try:
+        with transaction.atomic():
+            owned(job).update(
+                status=PENDING, locked_at=None, last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)),
+            )
+    except IntegrityError:
+        # В очереди уже есть задача с тем же ключом, она и повторит работу.
+        owned(job).update(status=DONE, last_error=error)
+
+
+def retry_locked(func, *args, attempts=8, **kwargs):
+    """
+    Повторяет запись, которую база отклонила из-за чужой блокировки:
+    SQLite отвечает "database is locked" сразу, не дожидаясь ее снятия.
+    """
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as error:
+            if 'locked' not in str(error) or attempt == attempts - 1:
+                raise
+            time.sleep(0.01 * 2 ** attempt * (1 + random.random()))
+
+
+def run(job):
+    """Выполняет взятую задачу; при ошибке повторяет ее с паузой."""
+    payload = json.loads(job.payload)
+    try:
+        func = REGISTRY[job.name]
+        func(*payload['args'], **payload['kwargs'])
+    except Exception as error:
+        logger.exception('Задача %s (%s) упала', job.pk, job.name)
+        retry_locked(fail, job, '{}: {}'.format(type(error).__name__, error))
+        return False
+    retry_locked(owned(job).update, status=DONE, locked_at=None)
+    return True
+
+
+def purge(batch_size=1000):
+    """
+    Удаляет выполненные задачи старше TASKS_KEEP_DONE и упавшие старше
+    TASKS_KEEP_FAILED секунд пачками, чтобы не держать таблицу долго.
+    """
+    now = timezone.now()
+    expired = (
+        Q(status=DONE,
+          run_at__lt=now - timedelta(seconds=settings.TASKS_KEEP_DONE))
+        | Q(status=FAILED,
+            run_at__lt=now - timedelta(seconds=settings.TASKS_KEEP_FAILED))
+    )
+    deleted = 0
+    while True:
+        batch = list(Job.objects.filter(expired)
+                     .values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Job.objects.filter(pk__in=batch).delete()[0]
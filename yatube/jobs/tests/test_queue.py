@@ -0,0 +1,173 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Comment, Post
+
+from .. import queue, worker
+from ..models import DONE, FAILED, PENDING, RUNNING, Job
+from ..worker import Worker
+
+User = get_user_model()
+calls = []
+
+
+@queue.task(queue='test')
+def remember(value):
+    calls.append(value)
+
+
+@queue.task(queue='test', max_attempts=2)
+def explode():
+    raise ValueError('бум')
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False, TASKS_RETRY_DELAY=0,
+                   TASKS_CONCURRENCY={'test': 1})
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def work(self):
+        return Worker(once=True).run()
+
+    def test_delay_and_run(self):
+        """Задача выполняется обработчиком, а не при постановке."""
+        remember.delay(1)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(self.work(), 1)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get().status, DONE)
+
+    def test_idempotency_key(self):
+        """Пока задача с ключом ждет в очереди, повтор не создается."""
+        remember.delay(1, key='one')
+        remember.delay(1, key='one')
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.work()
+        remember.delay(1, key='one')
+        self.assertEqual(Job.objects.filter(status=PENDING).count(), 1)
+
+    def test_retries(self):
+        """Упавшая задача повторяется, затем помечается ошибкой."""
+        explode.delay()
+        self.work()
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('бум', job.last_error)
+
+    def test_concurrency_limit(self):
+        """Сверх лимита очереди задачи не берутся."""
+        remember.delay(1)
+        Job.objects.create(name=remember.task_name, queue='test',
+                           status=RUNNING, locked_at=timezone.now())
+
+        self.assertIsNone(queue.claim('test-worker'))
+
+    def test_stale_job_reclaimed(self):
+        """Задачу зависшего обработчика берет другой."""
+        job = Job.objects.create(
+            name=remember.task_name, queue='test', status=RUNNING,
+            payload='{"args": [2], "kwargs": {}}',
+            locked_at=timezone.now() - timedelta(days=1)
+        )
+        self.work()
+
+        self.assertEqual(calls, [2])
+        job.refresh_from_db()
+        self.assertEqual(job.status, DONE)
+
+    def test_purge(self):
+        """Обработчик удаляет старые выполненные задачи."""
+        old = timezone.now() - timedelta(days=2)
+        for status in (DONE, FAILED, PENDING):
+            Job.objects.create(name=remember.task_name, queue='other',
+                               status=status, run_at=old)
+        Job.objects.create(name=remember.task_name, status=DONE)
+
+        Worker(queues=['test'], once=True).run()
+
+        self.assertEqual(
+            sorted(Job.objects.values_list('status', 'queue')),
+            [(DONE, 'default'), (FAILED, 'other'), (PENDING, 'other')]
+        )
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class WorkerThreadsTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_threads(self):
+        """Несколько потоков выполняют каждую задачу один раз без ошибок."""
+        for number in range(20):
+            remember.delay(number)
+
+        with mock.patch.object(worker.logger, 'exception') as logged:
+            Worker(threads=4, once=True).run()
+
+        logged.assert_not_called()
+        self.assertEqual(sorted(calls), list(range(20)))
+        self.assertFalse(Job.objects.exclude(status=DONE).exists())
+
+    @override_settings(TASKS_CONCURRENCY={'test': 1})
+    def test_concurrency_limit_under_race(self):
+        """Одновременные обработчики не берут задач сверх лимита."""
+        for number in range(4):
+            remember.delay(number)
+        checked = threading.Barrier(4)
+        waited = threading.local()
+        busy_queues = queue.busy_queues
+
+        def busy_after_all_checked(stale):
+            # Все обработчики видят свободную очередь до первого UPDATE.
+            busy = busy_queues(stale)
+            if not getattr(waited, 'done', False):
+                waited.done = True
+                checked.wait()
+            return busy
+
+        def take(number):
+            try:
+                queue.retry_locked(queue.claim, 'worker-%s' % number)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=take, args=(number,))
+                   for number in range(4)]
+        with mock.patch.object(queue, 'busy_queues', busy_after_all_checked):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(Job.objects.filter(status=RUNNING).count(), 1)
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class PostTasksTest(TestCase):
+    def test_comment_side_effects(self):
+        """Индексация и письмо о комментарии уходят в очередь."""
+        author = User.objects.create_user(username='mario',
+                                          email='mario@example.com')
+        reader = User.objects.create_user(username='luigi')
+        post = Post.objects.create(author=author, text='Пост')
+        Worker(once=True).run()
+
+        Comment.objects.create(post=post, author=reader, text='Привет')
+        self.assertEqual(len(mail.outbox), 0)
+
+        Worker(once=True).run()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['mario@example.com'])
+        self.assertFalse(Job.objects.exclude(status=DONE).exists())
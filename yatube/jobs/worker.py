@@ -0,0 +1,105 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+from . import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Обработчик очереди в N потоках. Каждый поток берет задачи по одной;
+    когда задач нет, ждет poll_interval секунд и раз в TASKS_PURGE_INTERVAL
+    удаляет старые задачи. С once=True потоки завершаются, как только
+    очередь опустеет.
+    """
+
+    def __init__(self, threads=1, queues=None, poll_interval=None,
+                 once=False):
+        self.threads = threads
+        self.queues = queues
+        self.poll_interval = (poll_interval if poll_interval is not None
+                              else settings.TASKS_POLL_INTERVAL)
+        self.once = once
+        self.stopped = threading.Event()
+        self.processed = 0
+        self.purged_at = None
+        self.lock = threading.Lock()
+
+    def name(self, number):
+        return '{}:{}:{}'.format(socket.gethostname(), os.getpid(), number)
+
+    def purge_due(self):
+        """Пора ли чистить старые задачи: раз в TASKS_PURGE_INTERVAL."""
+        now = time.monotonic()
+        with self.lock:
+            if (self.purged_at is not None
+                    and now - self.purged_at < settings.TASKS_PURGE_INTERVAL):
+                return False
+            self.purged_at = now
+            return True
+
+    def purge(self):
+        try:
+            deleted = queue.retry_locked(queue.purge)
+        except DatabaseError:
+            logger.exception('Не удалось удалить старые задачи')
+            return
+        if deleted:
+            logger.info('Удалено старых задач: %s', deleted)
+
+    def loop(self, number):
+        name = self.name(number)
+        while not self.stopped.is_set():
+            close_old_connections()
+            try:
+                job = queue.retry_locked(queue.claim, name, self.queues)
+            except DatabaseError:
+                logger.exception('Не удалось взять задачу из очереди')
+                self.stopped.wait(self.poll_interval)
+                continue
+            if job is None:
+                if self.purge_due():
+                    self.purge()
+                if self.once:
+                    return
+                self.stopped.wait(self.poll_interval)
+                continue
+            queue.run(job)
+            with self.lock:
+                self.processed += 1
+
+    def thread_loop(self, number):
+        try:
+            self.loop(number)
+        finally:
+            connection.close()
+
+    def run(self):
+        if self.threads == 1:
+            self.loop(0)
+            return self.processed
+        threads = [threading.Thread(target=self.thread_loop, args=(number,),
+                                    daemon=True)
+                   for number in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            logger.info('Остановка: ждем завершения текущих задач.')
+            self.stop()
+            for thread in threads:
+                thread.join()
+        return self.processed
+
+    def stop(self):
+        self.stopped.set()
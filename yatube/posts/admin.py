@@ -1,8 +1,25 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
+from . import exporter
 from .models import Comment, Follow, Group, Post
 
 
+def export_csv(modeladmin, request, queryset):
+    export = exporter.export_for(queryset.model)
+    rows = export.rows(queryset.order_by('pk'), chunk_size=2000)
+    response = StreamingHttpResponse(
+        exporter.lines(export, rows, 'csv', {}),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'attachment; filename="{}.csv"'.format(
+        queryset.model._meta.model_name)
+    return response
+
+
+export_csv.short_description = 'Выгрузить в CSV'
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
@@ -10,6 +27,7 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    actions = (export_csv,)
 
 
 @admin.register(Group)
@@ -23,9 +41,11 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'created')
     search_fields = ('text',)
     list_filter = ('created',)
+    actions = (export_csv,)
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     search_fields = ('user__username',)
+    actions = (export_csv,)
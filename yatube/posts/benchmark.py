@@ -0,0 +1,260 @@
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.urls import reverse
+
+from . import counters, search
+from .models import Comment, FeedEntry, Follow, Group, Post, User, UserStats
+from .utils import chunked
+
+PREFIX = 'bench-'
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+         'add_comment')
+SERVER_TIMING_QUERIES = re.compile(r'(?:^|, )db;[^,]*desc="(\d+) queries"')
+
+
+def bulk_create(model, objects, batch_size):
+    for chunk in chunked(objects, batch_size):
+        model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+def id_range(queryset):
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    return bounds['low'], bounds['high']
+
+
+def seed_feeds(batch_size):
+    """Раскладывает посты по лентам так же, как timeline.backfill."""
+    prolific = UserStats.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT).values('user')
+    follows = Follow.objects.exclude(author__in=prolific)
+    for batch in counters.batches(follows, batch_size):
+        posts = defaultdict(list)
+        rows = (Post.objects
+                .filter(author__in={follow.author_id for follow in batch})
+                .order_by('author', '-pub_date', '-id')
+                .values_list('author', 'pk', 'pub_date'))
+        for author_id, post_id, pub_date in rows:
+            if len(posts[author_id]) < settings.FEED_BACKFILL_LIMIT:
+                posts[author_id].append((post_id, pub_date))
+        bulk_create(FeedEntry, (
+            FeedEntry(user_id=follow.user_id, post_id=post_id,
+                      pub_date=pub_date)
+            for follow in batch
+            for post_id, pub_date in posts[follow.author_id]
+        ), batch_size)
+
+
+def seed(users, groups, posts, follows, comments, batch_size=1000,
+         random_seed=0):
+    """
+    Заполняет базу набором данных для нагрузочного теста. Объекты
+    создаются через bulk_create, поэтому счетчики и ленты затем
+    пересчитываются отдельно.
+    """
+    rng = random.Random(random_seed)
+    bulk_create(User, (
+        User(username='{}{}'.format(PREFIX, number),
+             password=UNUSABLE_PASSWORD_PREFIX)
+        for number in range(users)
+    ), batch_size)
+    bulk_create(Group, (
+        Group(title='{}{}'.format(PREFIX, number),
+              slug='{}{}'.format(PREFIX, number),
+              description='Группа для нагрузочного теста')
+        for number in range(groups)
+    ), batch_size)
+    user_ids = list(User.objects.filter(username__startswith=PREFIX)
+                    .values_list('pk', flat=True))
+    group_ids = list(Group.objects.filter(slug__startswith=PREFIX)
+                     .values_list('pk', flat=True)) or [None]
+    bulk_create(Post, (
+        Post(author_id=rng.choice(user_ids), group_id=rng.choice(group_ids),
+             text='Пост номер {} для нагрузочного теста'.format(number))
+        for number in range(posts)
+    ), batch_size)
+    bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in (
+            rng.sample(user_ids, 2) for _ in range(follows)
+        )
+    ), batch_size)
+    low, high = id_range(Post.objects.all())
+    if low is not None:
+        bulk_create(Comment, (
+            Comment(post_id=rng.randint(low, high),
+                    author_id=rng.choice(user_ids),
+                    text='Комментарий для нагрузочного теста')
+            for _ in range(comments)
+        ), batch_size)
+    counters.create_missing_stats(batch_size)
+    counters.reconcile_user_stats(batch_size)
+    counters.reconcile_comments_count(batch_size)
+    seed_feeds(batch_size)
+    search.rebuild(batch_size)
+    cache.clear()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def targets(rng):
+    """Случайные адреса и пользователи для каждой из проверяемых страниц."""
+    users = list(User.objects.filter(username__startswith=PREFIX)
+                 .values_list('username', flat=True)[:1000])
+    readers = list(User.objects.filter(username__startswith=PREFIX,
+                                       follower__isnull=False)
+                   .distinct()[:1000])
+    slugs = list(Group.objects.values_list('slug', flat=True)[:1000])
+    low, high = id_range(Post.objects.all())
+    if not readers or not slugs or low is None:
+        raise ValueError('Нет данных: сначала выполните seed_benchmark.')
+    return {
+        'index': lambda: ('get', reverse('posts:index'), None),
+        'group_posts': lambda: ('get', reverse(
+            'posts:group_posts', kwargs={'slug': rng.choice(slugs)}), None),
+        'profile': lambda: ('get', reverse(
+            'posts:profile', kwargs={'username': rng.choice(users)}), None),
+        'post_detail': lambda: ('get', reverse(
+            'posts:post_detail',
+            kwargs={'post_id': rng.randint(low, high)}), None),
+        'follow_index': lambda: ('get', reverse('posts:follow_index'),
+                                 rng.choice(readers)),
+        'add_comment': lambda: ('post', reverse(
+            'posts:add_comment', kwargs={'post_id': rng.randint(low, high)}),
+            rng.choice(readers)),
+    }
+
+
+def query_count(response):
+    """
+    Число запросов из Server-Timing: RequestMetricsMiddleware считает все
+    соединения, включая реплики и потоки gather().
+    """
+    match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+    if match is None:
+        raise ValueError('В ответе нет Server-Timing: нужен '
+                         'core.middleware.RequestMetricsMiddleware.')
+    return int(match.group(1))
+
+
+def measure(client, target):
+    method, url, user = target()
+    if user is not None:
+        client.force_login(user)
+    data = {'text': 'Комментарий'} if method == 'post' else None
+    started = time.perf_counter()
+    response = getattr(client, method)(url, data)
+    elapsed = time.perf_counter() - started
+    return elapsed, query_count(response), response.status_code
+
+
+def run_view(target, clients, requests):
+    timings, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = Client()
+        for _ in range(count):
+            elapsed, query_count, status = measure(client, target)
+            with lock:
+                timings.append(elapsed)
+                queries.append(query_count)
+                if status >= 400:
+                    errors.append(status)
+
+    def thread_worker(count):
+        try:
+            worker(count)
+        finally:
+            connection.close()
+
+    shares = [requests // clients + (number < requests % clients)
+              for number in range(clients)]
+    started = time.perf_counter()
+    if clients == 1:
+        worker(shares[0])
+    else:
+        threads = [threading.Thread(target=thread_worker, args=(share,))
+                   for share in shares]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'p50_ms': percentile(timings, 0.5) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'throughput_rps': len(timings) / wall if wall else None,
+        'queries_mean': sum(queries) / len(queries),
+        'queries_max': max(queries),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), cwd=settings.BASE_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            check=True, universal_newlines=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(views=VIEWS, clients=8, requests=200, warmup=10, random_seed=0):
+    """Прогоняет страницы параллельными клиентами и собирает метрики."""
+    if clients < 1 or requests < 1 or warmup < 0:
+        raise ValueError('Нужны хотя бы один клиент и один запрос, '
+                         'прогрев не может быть отрицательным.')
+    rng = random.Random(random_seed)
+    view_targets = targets(rng)
+    cache.clear()
+    results = {}
+    for view in views:
+        if warmup:
+            run_view(view_targets[view], 1, warmup)
+        results[view] = run_view(view_targets[view], clients, requests)
+    return {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'database': connection.vendor,
+        'clients': clients,
+        'dataset': {
+            model.__name__: model.objects.count()
+            for model in (User, Group, Post, Follow, Comment, FeedEntry)
+        },
+        'views': results,
+    }
+
+
+def compare(previous, current):
+    """Изменение задержек и запросов относительно прошлого прогона."""
+    changes = {}
+    for view, result in current['views'].items():
+        before = previous.get('views', {}).get(view)
+        if before is None:
+            continue
+        changes[view] = {
+            metric: result[metric] - before[metric]
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+        }
+    return changes
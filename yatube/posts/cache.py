@@ -0,0 +1,271 @@
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from core import replicas
+from core.metrics import record_cache
+
+from .models import Post
+
+INDEX = 'index'
+POST_TAGS_KEY = 'post-tags:{}'
+STATS_KEY = 'page-cache-stats:{}'
+STATS_EVENTS = ('hits', 'misses', 'stale', 'stale_served', 'recomputes')
+
+
+def author_tag(username):
+    return 'author:{}'.format(username)
+
+
+def group_tag(slug):
+    return 'group:{}'.format(slug)
+
+
+def version_key(tag):
+    return 'tag-version:{}'.format(tag)
+
+
+def tag_versions(tags):
+    keys = [version_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        initial = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, initial, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def changed_key(tag):
+    return version_key(tag) + ':changed'
+
+
+def _bump(tags):
+    for tag in tags:
+        key = version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+    now = time.time()
+    cache.set_many({changed_key(tag): now for tag in tags}, timeout=None)
+
+
+def tag_changed(tag):
+    """Когда тег последний раз сдвигался; None, если кэш этого не помнит."""
+    changed = cache.get(changed_key(tag))
+    if changed is None:
+        return None
+    return datetime.fromtimestamp(changed, tz=timezone.utc)
+
+
+def bump(*tags):
+    """
+    Сдвигает версии тегов сразу и еще раз после коммита, чтобы страница,
+    собранная параллельным запросом до коммита, не осталась в кэше.
+    """
+    tags = set(tags)
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def post_tags(post):
+    tags = [INDEX, author_tag(post.author.username)]
+    if post.group_id:
+        tags.append(group_tag(post.group.slug))
+    return tags
+
+
+def cached_post_tags(post_id):
+    """
+    Теги поста по id без запроса к базе. Запись удаляют сигналы при
+    изменении поста и при переименовании его автора или группы.
+    Для несуществующего поста None.
+    """
+    key = POST_TAGS_KEY.format(post_id)
+    tags = cache.get(key)
+    if tags is not None:
+        return tags
+    post = (Post.objects.select_related('author', 'group')
+            .filter(pk=post_id).first())
+    if post is None:
+        return None
+    tags = post_tags(post)
+    cache.set(key, tags, settings.OBJECT_CACHE_TIMEOUT)
+    return tags
+
+
+def forget_post_tags(*post_ids):
+    cache.delete_many([POST_TAGS_KEY.format(pk) for pk in post_ids])
+
+
+def group_tags(group):
+    usernames = (group.posts.values_list('author__username', flat=True)
+                 .order_by().distinct())
+    return ([INDEX, group_tag(group.slug)]
+            + [author_tag(username) for username in usernames])
+
+
+def user_tags(user):
+    slugs = (user.posts.exclude(group=None)
+             .values_list('group__slug', flat=True)
+             .order_by().distinct())
+    return ([INDEX, author_tag(user.username)]
+            + [group_tag(slug) for slug in slugs])
+
+
+def page_key(request, key_prefix):
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return 'page:{}:{}:{}'.format(key_prefix, user, path)
+
+
+def etag_for(request, versions):
+    """ETag страницы: адрес, пользователь и версии тегов."""
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = '{}:{}:{}'.format(user, request.get_full_path(), versions)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def lock_key(key):
+    return 'lock:' + key
+
+
+def page_etag(request, tags):
+    return etag_for(request, tag_versions(tags))
+
+
+def condition_by_tags(*tags, tags_for=None):
+    """
+    Условный GET по версиям тегов: если теги не сдвигались, клиент с
+    If-None-Match получает 304 без шаблонов и запросов к спискам. Теги
+    берутся из URL, как у cache_page_by_tags, или из tags_for(**kwargs);
+    если tags_for вернул None, ETag не выставляется.
+    """
+    def etag(request, *args, **kwargs):
+        if tags_for is None:
+            page_tags = [tag.format(**kwargs) for tag in tags]
+        else:
+            page_tags = tags_for(**kwargs)
+        if page_tags is None:
+            return None
+        return page_etag(request, page_tags)
+    return condition(etag_func=etag)
+
+
+def count(event):
+    record_cache(event)
+    key = STATS_KEY.format(event)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def stats():
+    keys = {STATS_KEY.format(event): event for event in STATS_EVENTS}
+    values = cache.get_many(keys)
+    return {event: values.get(key, 0) for key, event in keys.items()}
+
+
+def is_fresh(entry, versions):
+    """
+    Запись свежая, если версии тегов не менялись и она не выбрана для
+    досрочного пересчета (XFetch: чем дольше считалась страница и чем
+    ближе срок жизни, тем выше шанс пересчитать ее заранее).
+    """
+    if entry['versions'] != versions:
+        return False
+    if entry['expires'] is None:
+        return True
+    early = entry['delta'] * settings.PAGE_CACHE_BETA * math.log(
+        1 - random.random())
+    return time.time() - early < entry['expires']
+
+
+def recompute(key, versions, view, request, *args, **kwargs):
+    started = time.time()
+    response = view(request, *args, **kwargs)
+    delta = time.time() - started
+    if response.status_code == 200 and not response.cookies:
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if replicas.replica_used():
+            # Реплика могла еще не получить запись, из-за которой сменилась
+            # версия тегов, поэтому такая страница живет не дольше лага.
+            timeout = min(timeout or settings.REPLICA_MAX_LAG,
+                          settings.REPLICA_MAX_LAG)
+        entry = {
+            'response': response,
+            'versions': versions,
+            'delta': delta,
+            'expires': started + timeout if timeout is not None else None,
+        }
+        stored_for = (timeout + settings.PAGE_CACHE_STALE_TIMEOUT
+                      if timeout is not None else None)
+        cache.set(key, entry, stored_for)
+    count('recomputes')
+    return response
+
+
+def wait_for(key, versions):
+    deadline = time.time() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry['versions'] == versions:
+            return entry
+    return None
+
+
+def cache_page_by_tags(*tags, key_prefix):
+    """
+    Кэширует страницу, ключ включает версии тегов. Теги форматируются
+    параметрами из URL: cache_page_by_tags('group:{slug}'). Устаревшую
+    страницу пересчитывает один запрос, остальные получают старую копию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = tag_versions([tag.format(**kwargs) for tag in tags])
+            key = page_key(request, key_prefix)
+            entry = cache.get(key)
+            if entry is not None and is_fresh(entry, versions):
+                count('hits')
+                return entry['response']
+            lock = lock_key(key)
+            if cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    count('misses' if entry is None else 'stale')
+                    return recompute(key, versions, view, request,
+                                     *args, **kwargs)
+                finally:
+                    cache.delete(lock)
+            if entry is not None:
+                count('stale_served')
+                # У старой копии ETag ее версий тегов, иначе клиент
+                # получал бы 304 на старую страницу и после пересчета.
+                response = entry['response']
+                response['ETag'] = quote_etag(
+                    etag_for(request, entry['versions']))
+                return response
+            entry = wait_for(key, versions)
+            if entry is not None:
+                count('hits')
+                return entry['response']
+            count('misses')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
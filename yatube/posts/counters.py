@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def increment(queryset, field, delta=1):
+    if delta < 0:
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_stats(user_id, field, delta=1):
+    increment(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def change_comments(post_id, delta=1):
+    increment(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def change_many(queryset, key, field, deltas):
+    """Прибавляет deltas[id] к field: по UPDATE на каждую величину сдвига."""
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        increment(queryset.filter(**{key + '__in': ids}), field, delta)
+
+
+def change_stats_many(field, deltas):
+    change_many(UserStats.objects.all(), 'user_id', field, deltas)
+
+
+def change_comments_many(deltas):
+    change_many(Post.objects.all(), 'pk', 'comments_count', deltas)
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(user=user, defaults={
+            'posts_count': user.posts.count(),
+            'followers_count': user.following.count(),
+            'following_count': user.follower.count(),
+        })
+        return stats
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний объект."""
+    rows = (model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def drifted_user_stats():
+    return UserStats.objects.annotate(
+        actual_posts=count_of(Post, 'author'),
+        actual_followers=count_of(Follow, 'author'),
+        actual_following=count_of(Follow, 'user'),
+    ).filter(
+        ~Q(posts_count=F('actual_posts'))
+        | ~Q(followers_count=F('actual_followers'))
+        | ~Q(following_count=F('actual_following'))
+    )
+
+
+def batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                     [:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def create_missing_stats(batch_size):
+    users = User.objects.filter(stats__isnull=True)
+    created = 0
+    for batch in batches(users, batch_size):
+        UserStats.objects.bulk_create(
+            (UserStats(user=user) for user in batch), ignore_conflicts=True
+        )
+        created += len(batch)
+    return created
+
+
+def reconcile_user_stats(batch_size):
+    fixed = 0
+    for batch in batches(drifted_user_stats(), batch_size):
+        for stats in batch:
+            stats.posts_count = stats.actual_posts
+            stats.followers_count = stats.actual_followers
+            stats.following_count = stats.actual_following
+        UserStats.objects.bulk_update(
+            batch, ('posts_count', 'followers_count', 'following_count')
+        )
+        fixed += len(batch)
+    return fixed
+
+
+def reconcile_comments_count(batch_size):
+    posts = Post.objects.annotate(
+        actual_comments=count_of(Comment, 'post')
+    ).filter(~Q(comments_count=F('actual_comments'))).only('pk')
+    fixed = 0
+    for batch in batches(posts, batch_size):
+        for post in batch:
+            post.comments_count = post.actual_comments
+        Post.objects.bulk_update(batch, ('comments_count',))
+        fixed += len(batch)
+    return fixed
@@ -0,0 +1,119 @@
+import csv
+import json
+import math
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min, Q
+
+from .models import Comment, Follow, Post
+
+FORMATS = ('ndjson', 'csv')
+
+
+class Export:
+    """Выгружаемая модель: столбцы и пути к ним в ORM, поле даты."""
+
+    def __init__(self, model, columns, date_field=None):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+
+    def queryset(self, since=None, since_id=None, using=None):
+        """
+        Строки новее любой из отметок: с id больше since_id или с датой
+        позже since. Так вместе с новыми выгружаются и измененные старые.
+        """
+        queryset = self.model.objects.using(using).order_by('pk')
+        if since is not None and self.date_field is None:
+            raise ValueError('У {} нет поля даты.'.format(
+                self.model._meta.verbose_name_plural))
+        newer = Q()
+        if since is not None:
+            newer |= Q(**{self.date_field + '__gt': since})
+        if since_id is not None:
+            newer |= Q(pk__gt=since_id)
+        return queryset.filter(newer)
+
+    def rows(self, queryset, chunk_size):
+        paths = list(self.columns.values())
+        if self.date_field is not None:
+            paths.append(self.date_field)
+        return queryset.values_list('pk', *paths).iterator(
+            chunk_size=chunk_size)
+
+
+EXPORTS = {
+    'posts': Export(Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'comments_count': 'comments_count',
+    }, 'updated'),
+    'comments': Export(Comment, {
+        'id': 'pk',
+        'post': 'post',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }, 'created'),
+    'follows': Export(Follow, {
+        'id': 'pk',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def export_for(model):
+    for export in EXPORTS.values():
+        if export.model is model:
+            return export
+    raise LookupError(model)
+
+
+def shard(queryset, number, shards):
+    """
+    Диапазон id для части number из shards: id между минимумом и
+    максимумом делятся на равные отрезки, части можно выгружать
+    параллельно.
+    """
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return queryset.none()
+    step = math.ceil((bounds['high'] - bounds['low'] + 1) / shards)
+    low = bounds['low'] + number * step
+    return queryset.filter(pk__gte=low, pk__lt=low + step)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def lines(export, rows, fmt, watermark):
+    """
+    Строки выгрузки по одной. В watermark записываются наибольшие id и
+    дата выгруженных строк, с них начнется следующая выгрузка.
+    """
+    names = list(export.columns)
+    writer = csv.writer(Echo())
+    if fmt == 'csv':
+        yield writer.writerow(names)
+    for pk, *values in rows:
+        watermark['rows'] = watermark.get('rows', 0) + 1
+        watermark['id'] = max(watermark.get('id') or pk, pk)
+        if export.date_field is not None:
+            date = values.pop()
+            if watermark.get('date') is None or date > watermark['date']:
+                watermark['date'] = date
+        if fmt == 'csv':
+            yield writer.writerow(values)
+        else:
+            yield json.dumps(dict(zip(names, values)), cls=DjangoJSONEncoder,
+                             ensure_ascii=False) + '\n'
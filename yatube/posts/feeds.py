@@ -0,0 +1,213 @@
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import condition
+
+from . import cache
+from .utils import CursorPaginator, encode_cursor
+
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+
+
+class StreamingFeed:
+    """Пишет ленту по частям: шапку, каждую запись и хвост отдельно."""
+
+    def latest_post_date(self):
+        return self.feed.get('updated') or timezone.now()
+
+    def item_element(self, handler, item):
+        handler.startElement(self.item_tag, self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement(self.item_tag)
+
+
+class StreamingAtomFeed(StreamingFeed, Atom1Feed):
+    item_tag = 'entry'
+    next_tag = 'link'
+
+    def open(self, handler):
+        handler.startElement('feed', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def close(self, handler):
+        handler.endElement('feed')
+
+
+class StreamingRssFeed(StreamingFeed, Rss201rev2Feed):
+    item_tag = 'item'
+    next_tag = 'atom:link'
+
+    def open(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def close(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+XML_FEEDS = {
+    'atom': StreamingAtomFeed,
+    'rss': StreamingRssFeed,
+}
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+
+class Timeline:
+    """
+    Страница ленты: не больше FEED_ITEMS постов после курсора. Посты
+    читаются сразу, во view, чтобы запрос попал в бюджет и лимит базы;
+    потоком отдается только сериализация.
+    """
+
+    def __init__(self, post_list, cursor):
+        paginator = CursorPaginator(post_list, settings.FEED_ITEMS)
+        queryset, _, _ = paginator.keyset(cursor)
+        self.posts = list(queryset.select_related('author', 'group')
+                          [:settings.FEED_ITEMS + 1])
+        self.next_cursor = None
+        if len(self.posts) > settings.FEED_ITEMS:
+            del self.posts[settings.FEED_ITEMS:]
+            last = self.posts[-1]
+            self.next_cursor = encode_cursor(last.pub_date, last.pk)
+
+    def __iter__(self):
+        return iter(self.posts)
+
+
+def drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def item_for(request, post):
+    link = request.build_absolute_uri(
+        reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+    return {
+        'title': Truncator(post.text).chars(50),
+        'link': link,
+        'description': post.text,
+        'author_name': post.author.username,
+        'pubdate': post.pub_date,
+        'updateddate': post.updated,
+        'unique_id': link,
+        'categories': [post.group.title] if post.group else (),
+    }
+
+
+def next_url(request, timeline):
+    if timeline.next_cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = timeline.next_cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def stream_xml(request, fmt, meta, timeline):
+    feed = XML_FEEDS[fmt](**meta)
+    buffer = io.StringIO()
+    handler = SimplerXMLGenerator(buffer, 'utf-8')
+    handler.startDocument()
+    feed.open(handler)
+    yield drain(buffer)
+    for post in timeline:
+        feed.add_item(**item_for(request, post))
+        feed.item_element(handler, feed.items.pop())
+        yield drain(buffer)
+    url = next_url(request, timeline)
+    if url is not None:
+        handler.addQuickElement(feed.next_tag, '',
+                                {'rel': 'next', 'href': url})
+    feed.close(handler)
+    yield drain(buffer)
+
+
+def stream_json(request, meta, timeline):
+    head = {
+        'version': JSON_FEED_VERSION,
+        'title': meta['title'],
+        'home_page_url': meta['link'],
+        'feed_url': meta['feed_url'],
+        'description': meta['description'],
+    }
+    yield json.dumps(head, ensure_ascii=False)[:-1] + ', "items": ['
+    separator = ''
+    for post in timeline:
+        item = item_for(request, post)
+        yield separator + json.dumps({
+            'id': item['unique_id'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['description'],
+            'date_published': item['pubdate'],
+            'date_modified': item['updateddate'],
+            'authors': [{'name': item['author_name']}],
+            'tags': list(item['categories']),
+        }, cls=DjangoJSONEncoder, ensure_ascii=False)
+        separator = ', '
+    url = next_url(request, timeline)
+    tail = ', "next_url": {}'.format(json.dumps(url)) if url else ''
+    yield ']' + tail + '}'
+
+
+def feed_response(request, fmt, title, link, post_list):
+    if fmt not in CONTENT_TYPES:
+        raise Http404('Неизвестный формат ленты')
+    meta = {
+        'title': title,
+        'link': request.build_absolute_uri(link),
+        'description': title,
+        'feed_url': request.build_absolute_uri(),
+        'language': settings.LANGUAGE_CODE,
+        'updated': latest_date(request, post_list),
+    }
+    timeline = Timeline(post_list, request.GET.get('cursor'))
+    if fmt == 'json':
+        content = stream_json(request, meta, timeline)
+    else:
+        content = stream_xml(request, fmt, meta, timeline)
+    return StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+
+
+def latest_date(request, post_list):
+    """Дата последней правки в ленте, один запрос на ответ."""
+    if not hasattr(request, 'feed_updated'):
+        request.feed_updated = post_list.aggregate(
+            updated=Max('updated'))['updated']
+    return request.feed_updated
+
+
+def conditional_feed(tag, post_list_for):
+    """
+    Условный GET для ленты: ETag из версии тега, Last-Modified по дате
+    последней правки поста или, если позже, последнего сдвига тега (так
+    видно и удаление). При If-None-Match дата не запрашивается вовсе.
+    """
+    def etag(request, fmt, **kwargs):
+        return cache.page_etag(request, [tag.format(**kwargs)])
+
+    def last_modified(request, fmt, **kwargs):
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            return None
+        dates = [latest_date(request, post_list_for(**kwargs)),
+                 cache.tag_changed(tag.format(**kwargs))]
+        return max((date for date in dates if date is not None),
+                   default=None)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
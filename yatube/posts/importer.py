@@ -0,0 +1,183 @@
+import csv
+import json
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, search, timeline
+from .models import Comment, Group, Post, User
+from .utils import chunked
+
+FORMATS = ('ndjson', 'csv')
+
+
+def read_records(stream, fmt):
+    """
+    Построчно читает записи из NDJSON или CSV и отдает пары
+    (номер строки, словарь). Запись с полем post считается комментарием.
+    """
+    if fmt == 'csv':
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            yield line, row
+        return
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            record = None
+        yield line, record if isinstance(record, dict) else {}
+
+
+def parse_date(raw):
+    if raw is None:
+        return None
+    date = parse_datetime(raw)
+    if date is None:
+        raise ValueError('Неверная дата: {}.'.format(raw))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def value(record, name):
+    raw = record.get(name)
+    return None if raw is None or raw == '' else str(raw)
+
+
+def prepare(records):
+    """
+    Проверяет пачку записей и собирает из нее посты и комментарии. Авторы,
+    группы и посты для комментариев загружаются тремя запросами на пачку.
+    Возвращает (посты, комментарии, ошибки), ошибки - пары (строка, текст).
+    """
+    usernames = {value(record, 'author') for _, record in records}
+    slugs = {value(record, 'group') for _, record in records}
+    post_ids = {value(record, 'post') for _, record in records}
+    authors = {user.username: user for user in
+               User.objects.filter(username__in=usernames - {None})}
+    groups = {group.slug: group for group in
+              Group.objects.filter(slug__in=slugs - {None})}
+    targets = Post.objects.select_related('author', 'group').in_bulk(
+        [int(pk) for pk in post_ids - {None} if pk.isdigit()])
+    posts, comments, errors = [], [], []
+    for line, record in records:
+        author = authors.get(value(record, 'author'))
+        text = value(record, 'text')
+        post_id = value(record, 'post')
+        slug = value(record, 'group')
+        try:
+            if text is None:
+                raise ValueError('Нет текста.')
+            if author is None:
+                raise ValueError('Нет автора {}.'.format(
+                    value(record, 'author')))
+            if post_id is not None:
+                post = targets.get(int(post_id) if post_id.isdigit()
+                                   else None)
+                if post is None:
+                    raise ValueError('Нет поста {}.'.format(post_id))
+                comment = Comment(post=post, author=author, text=text)
+                comment.legacy_date = parse_date(value(record, 'created'))
+                comments.append(comment)
+                continue
+            if slug is not None and slug not in groups:
+                raise ValueError('Нет группы {}.'.format(slug))
+            post = Post(author=author, group=groups.get(slug), text=text)
+            post.legacy_date = parse_date(value(record, 'pub_date'))
+            posts.append(post)
+        except ValueError as error:
+            errors.append((line, str(error)))
+    return posts, comments, errors
+
+
+def refetch_pks(model, objects, date_field):
+    """
+    Находит pk вставленных объектов по автору, тексту и дате, которую
+    auto_now_add поставил до вставки. Одинаковые записи получают pk по
+    порядку вставки.
+    """
+    key = ('author_id', 'text', date_field)
+    rows = model.objects.filter(**{
+        'author_id__in': {obj.author_id for obj in objects},
+        date_field + '__in': {getattr(obj, date_field) for obj in objects},
+    }).order_by('pk').values_list('pk', *key)
+    pks = defaultdict(list)
+    for pk, *values in rows:
+        pks[tuple(values)].append(pk)
+    for obj in objects:
+        obj.pk = pks[tuple(getattr(obj, name) for name in key)].pop(0)
+
+
+def insert(model, objects, date_field):
+    """
+    bulk_create с заполнением pk. Если база не возвращает id вставки, на
+    SQLite берутся последние id: писатель в базе один, и вставки транзакции
+    идут подряд. На других базах id параллельных вставок могут чередоваться,
+    поэтому строки ищутся заново по значениям полей.
+    Даты из записей ставятся одним UPDATE поверх auto_now_add.
+    """
+    if not objects:
+        return
+    model.objects.bulk_create(objects)
+    if objects[0].pk is None:
+        connection = connections[router.db_for_write(model)]
+        if connection.vendor != 'sqlite':
+            refetch_pks(model, objects, date_field)
+        else:
+            pks = (model.objects.order_by('-pk')
+                   .values_list('pk', flat=True)[:len(objects)])
+            for obj, pk in zip(objects, reversed(list(pks))):
+                obj.pk = pk
+    dated = [obj for obj in objects if obj.legacy_date is not None]
+    for obj in dated:
+        setattr(obj, date_field, obj.legacy_date)
+    if dated:
+        model.objects.bulk_update(dated, (date_field,))
+
+
+def write(posts, comments):
+    """
+    Вставляет посты и комментарии пачкой и обновляет производные данные
+    так же, как сигналы при сохранении по одному: счетчики, ленты
+    подписок, поисковый индекс и версии тегов кэша страниц.
+    """
+    insert(Post, posts, 'pub_date')
+    insert(Comment, comments, 'created')
+    posts_count, comments_count, tags = {}, {}, set()
+    for post in posts:
+        posts_count[post.author_id] = posts_count.get(post.author_id, 0) + 1
+        tags.update(cache.post_tags(post))
+    for comment in comments:
+        comments_count[comment.post_id] = (
+            comments_count.get(comment.post_id, 0) + 1)
+        tags.update(cache.post_tags(comment.post))
+    counters.change_stats_many('posts_count', posts_count)
+    counters.change_comments_many(comments_count)
+    if posts:
+        timeline.fan_out_many(posts)
+    search.index_many(search.POST, [(post.pk, post.pk, post.text)
+                                    for post in posts])
+    search.index_many(search.COMMENT, [
+        (comment.pk, comment.post_id, comment.text) for comment in comments
+    ])
+    cache.bump(*tags)
+
+
+def import_records(records, batch_size=1000):
+    """
+    Импортирует записи пачками по batch_size, каждая пачка - отдельная
+    транзакция. Ошибочные записи пропускаются и попадают в отчет.
+    """
+    report = {'posts': 0, 'comments': 0, 'errors': []}
+    for batch in chunked(records, batch_size):
+        with transaction.atomic():
+            posts, comments, errors = prepare(batch)
+            write(posts, comments)
+        report['posts'] += len(posts)
+        report['comments'] += len(comments)
+        report['errors'].extend(errors)
+    return report
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import exporter
+
+
+def parse_shard(value):
+    try:
+        number, shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError('--shard задается как K/N, например 0/4.')
+    if not 0 <= number < shards:
+        raise CommandError('Номер части должен быть от 0 до N-1.')
+    return number, shards
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии или подписки в NDJSON '
+            'или CSV, целиком или начиная с отметки прошлой выгрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exporter.EXPORTS))
+        parser.add_argument('--format', choices=exporter.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--output', default='-',
+                            help='файл, .gz сжимается; - для stdout')
+        parser.add_argument('--since', help='дата прошлой выгрузки')
+        parser.add_argument('--since-id', type=int,
+                            help='наибольший id прошлой выгрузки')
+        parser.add_argument('--shard', help='часть K/N по диапазону id')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, kind, format, output, since, since_id, shard,
+               chunk_size, database, **options):
+        export = exporter.EXPORTS[kind]
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                raise CommandError('Неверная дата в --since.')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        try:
+            queryset = export.queryset(since, since_id, using=database)
+        except ValueError as error:
+            raise CommandError(error)
+        if shard:
+            queryset = exporter.shard(queryset, *parse_shard(shard))
+        watermark = {'rows': 0, 'id': None, 'date': None}
+        lines = exporter.lines(export, export.rows(queryset, chunk_size),
+                               format, watermark)
+        if output == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            opener = gzip.open if output.endswith('.gz') else open
+            with opener(output, 'wt', encoding='utf-8',
+                        newline='') as target:
+                target.writelines(lines)
+        # Отметка для следующей выгрузки: --since-id и --since, строка
+        # выгрузится, если она новее любой из них. Дата пишется
+        # с микросекундами, иначе последняя строка выгрузится снова.
+        if watermark['date'] is not None:
+            watermark['date'] = watermark['date'].isoformat()
+        self.stderr.write(json.dumps(watermark))
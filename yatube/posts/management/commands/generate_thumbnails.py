@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь генерацию миниатюр для постов с картинкой, '
+            'у которых миниатюр еще нет, например после импорта.')
+
+    def handle(self, *args, **options):
+        post_ids = (Post.objects.exclude(image='').filter(thumbnails='')
+                    .values_list('pk', flat=True))
+        total = 0
+        for post_id in post_ids.iterator():
+            thumbnails.generate.delay(
+                post_id, key='thumbnails:{}'.format(post_id))
+            total += 1
+        self.stdout.write('Поставлено задач: {}'.format(total))
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты и комментарии из NDJSON или CSV пачками '
+            'через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с записями, - для stdin')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='по умолчанию - по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, path, format, batch_size, **options):
+        fmt = format or ('csv' if path.endswith('.csv') else 'ndjson')
+        if path == '-':
+            report = importer.import_records(
+                importer.read_records(sys.stdin, fmt), batch_size)
+        else:
+            try:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    report = importer.import_records(
+                        importer.read_records(stream, fmt), batch_size)
+            except OSError as error:
+                raise CommandError(error)
+        for line, message in report['errors']:
+            self.stderr.write('Строка {}: {}'.format(line, message))
+        self.stdout.write('Импортировано постов: {}, комментариев: {}, '
+                          'пропущено строк: {}'.format(
+                              report['posts'], report['comments'],
+                              len(report['errors'])))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и пересчетов кэша страниц.'
+
+    def handle(self, *args, **options):
+        for event, value in cache.stats().items():
+            self.stdout.write('{}: {}'.format(event, value))
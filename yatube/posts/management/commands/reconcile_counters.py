@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        created = counters.create_missing_stats(batch_size)
+        users = counters.reconcile_user_stats(batch_size)
+        posts = counters.reconcile_comments_count(batch_size)
+        self.stdout.write(
+            'Создано статистик: {}, исправлено пользователей: {}, '
+            'исправлено постов: {}'.format(created, users, posts)
+        )
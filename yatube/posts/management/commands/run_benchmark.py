@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Нагружает страницы постов параллельными клиентами и '
+            'сохраняет задержки, пропускную способность и число запросов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', nargs='+', choices=benchmark.VIEWS,
+                            default=benchmark.VIEWS)
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='файл для результатов в JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+
+    def handle(self, *args, views, clients, requests, warmup, seed, output,
+               compare, **options):
+        try:
+            results = benchmark.run(views, clients=clients,
+                                    requests=requests, warmup=warmup,
+                                    random_seed=seed)
+        except ValueError as error:
+            raise CommandError(error)
+        if compare:
+            with open(compare) as previous:
+                results['changes'] = benchmark.compare(json.load(previous),
+                                                       results)
+        report = json.dumps(results, indent=2, ensure_ascii=False)
+        if output:
+            with open(output, 'w') as target:
+                target.write(report)
+        self.stdout.write(report)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу данными для нагрузочного теста.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=10000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, users, groups, posts, follows, comments,
+               batch_size, seed, **options):
+        benchmark.seed(users, groups, posts, follows, comments,
+                       batch_size=batch_size, random_seed=seed)
+        self.stdout.write('Данные для нагрузочного теста созданы.')
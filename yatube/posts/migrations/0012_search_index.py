@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def build_index(apps, schema_editor):
+    from posts import search
+    search.rebuild(1000, apps.get_model('posts', 'Post'),
+                   apps.get_model('posts', 'Comment'),
+                   schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from posts import search
+    backend = search.backend_for(schema_editor.connection)
+    if backend is not None:
+        backend.uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from core.caches import LocalLRU
+
+from .models import Group, User
+
+GENERATION_KEY = 'object-generation:{}'
+
+
+class ObjectCache:
+    """
+    Кэш редко меняющихся объектов по уникальному полю: LRU в процессе (L1),
+    затем общий кэш (L2), затем база. При сохранении или удалении объекта
+    сигнал вызывает invalidate: запись удаляется из L2, а поколение модели
+    в L2 сдвигается, и другие процессы очищают свой L1 при следующей
+    сверке (не реже раза в OBJECT_CACHE_CHECK_INTERVAL секунд).
+    Если заданы fields, из базы читаются и кэшируются только они: пароль
+    и почта пользователя не попадают в общий кэш.
+    """
+
+    def __init__(self, model, field, fields=None):
+        self.model = model
+        self.field = field
+        self.fields = set(fields) if fields else None
+        self.l1 = LocalLRU(settings.OBJECT_CACHE_L1_MAX_ENTRIES,
+                           settings.OBJECT_CACHE_L1_TIMEOUT)
+        self.generation_key = GENERATION_KEY.format(model._meta.label_lower)
+        self.generation = None
+        self.checked = None
+
+    def key(self, value):
+        return 'object:{}:{}:{}'.format(self.model._meta.label_lower,
+                                        self.field, value)
+
+    def sync(self):
+        now = time.monotonic()
+        if (self.checked is not None and now - self.checked
+                < settings.OBJECT_CACHE_CHECK_INTERVAL):
+            return
+        self.checked = now
+        generation = cache.get(self.generation_key)
+        if generation != self.generation:
+            self.l1.clear()
+            self.generation = generation
+
+    def get(self, value):
+        """Объект по значению поля или model.DoesNotExist."""
+        self.sync()
+        key = self.key(value)
+        obj = self.l1.get(key)
+        if obj is not None:
+            return obj
+        obj = cache.get(key)
+        if obj is None:
+            objects = self.model._default_manager.all()
+            if self.fields:
+                objects = objects.only(*self.fields)
+            obj = objects.get(**{self.field: value})
+            cache.set(key, obj, settings.OBJECT_CACHE_TIMEOUT)
+        self.l1.set(key, obj)
+        return obj
+
+    def get_or_404(self, value):
+        try:
+            return self.get(value)
+        except self.model.DoesNotExist:
+            raise Http404('{} не найден'.format(self.model._meta.verbose_name))
+
+    def affected(self, update_fields):
+        """Меняет ли save(update_fields=...) закэшированные поля."""
+        return (update_fields is None or self.fields is None
+                or bool(self.fields & set(update_fields)))
+
+    def invalidate(self, *instances):
+        for instance in instances:
+            key = self.key(getattr(instance, self.field))
+            self.l1.delete(key)
+            cache.delete(key)
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, int(time.time() * 1000), None)
+        self.checked = None
+
+
+groups = ObjectCache(Group, 'slug')
+users = ObjectCache(User, 'username',
+                    fields=('username', 'first_name', 'last_name'))
@@ -0,0 +1,267 @@
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, connections, router
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+POST = 0
+COMMENT = 1
+BACKENDS = {
+    'sqlite': 'posts.search.SqliteBackend',
+    'postgresql': 'posts.search.PostgresBackend',
+}
+
+
+def row_id(kind, pk):
+    """Посты и комментарии лежат в одной таблице с непересекающимися id."""
+    return pk * 2 + kind
+
+
+def post_rows_sql(key):
+    """Условие на строки поста и его комментариев; key - столбец с row_id."""
+    return (
+        '{key} = %s * 2 + {post} OR {key} IN '
+        '(SELECT id * 2 + {comment} FROM {table} WHERE post_id = %s)'
+    ).format(key=key, post=POST, comment=COMMENT,
+             table=Comment._meta.db_table)
+
+
+class SqliteBackend:
+    """Индекс FTS5, ранжирование по bm25."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5("
+                "post_id UNINDEXED, text, tokenize='unicode61')"
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+    def index(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT OR REPLACE INTO posts_search (rowid, post_id, text) '
+                'VALUES (%s, %s, %s)',
+                [(row_id(kind, pk), post_id, text)
+                 for kind, pk, post_id, text in rows]
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search WHERE rowid = %s',
+                           [row_id(kind, pk)])
+
+    def remove_post(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search WHERE '
+                           + post_rows_sql('rowid'), [post_id, post_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+
+    def match(self, query):
+        return ' '.join('"{}"'.format(word.replace('"', '""'))
+                        for word in query.split())
+
+    def search(self, query, offset, limit):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id, MIN(rank) AS best FROM ('
+                'SELECT post_id, rank FROM posts_search '
+                'WHERE posts_search MATCH %s) '
+                'GROUP BY post_id ORDER BY best, post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [self.match(query), limit, offset]
+            )
+            return [post_id for post_id, rank in cursor.fetchall()]
+
+    def count(self, query):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(DISTINCT post_id) FROM posts_search '
+                'WHERE posts_search MATCH %s',
+                [self.match(query)]
+            )
+            return cursor.fetchone()[0]
+
+
+class PostgresBackend:
+    """Столбец tsvector с GIN-индексом, ранжирование по ts_rank."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.config = settings.SEARCH_CONFIG
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS posts_search ('
+                'id bigint PRIMARY KEY, post_id integer NOT NULL, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS posts_search_document_idx '
+                'ON posts_search USING GIN (document)'
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS posts_search')
+
+    def index(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_search (id, post_id, document) '
+                'VALUES (%s, %s, to_tsvector(%s::regconfig, %s)) '
+                'ON CONFLICT (id) DO UPDATE SET '
+                'post_id = EXCLUDED.post_id, document = EXCLUDED.document',
+                [(row_id(kind, pk), post_id, self.config, text)
+                 for kind, pk, post_id, text in rows]
+            )
+
+    def remove(self, kind, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search WHERE id = %s',
+                           [row_id(kind, pk)])
+
+    def remove_post(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search WHERE '
+                           + post_rows_sql('id'), [post_id, post_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('TRUNCATE posts_search')
+
+    def search(self, query, offset, limit):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id, MAX(ts_rank(document, query)) AS best '
+                'FROM posts_search, plainto_tsquery(%s::regconfig, %s) query '
+                'WHERE document @@ query '
+                'GROUP BY post_id ORDER BY best DESC, post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [self.config, query, limit, offset]
+            )
+            return [post_id for post_id, rank in cursor.fetchall()]
+
+    def count(self, query):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(DISTINCT post_id) FROM posts_search '
+                'WHERE document @@ plainto_tsquery(%s::regconfig, %s)',
+                [self.config, query]
+            )
+            return cursor.fetchone()[0]
+
+
+def backend_for(connection):
+    path = settings.SEARCH_BACKEND or BACKENDS.get(connection.vendor)
+    return import_string(path)(connection) if path else None
+
+
+def index_post(post):
+    backend = backend_for(connection)
+    if backend is not None:
+        backend.index([(POST, post.pk, post.pk, post.text)])
+
+
+def index_comment(comment):
+    backend = backend_for(connection)
+    if backend is not None:
+        backend.index([(COMMENT, comment.pk, comment.post_id, comment.text)])
+
+
+def index_many(kind, rows):
+    """Индексирует пачку строк (pk, post_id, text) одним executemany."""
+    backend = backend_for(connection)
+    if backend is not None and rows:
+        backend.index([(kind, pk, post_id, text)
+                       for pk, post_id, text in rows])
+
+
+def remove(kind, pk):
+    backend = backend_for(connection)
+    if backend is not None:
+        backend.remove(kind, pk)
+
+
+def remove_post(post_id):
+    """Убирает из индекса пост и все его комментарии одним запросом."""
+    backend = backend_for(connection)
+    if backend is not None:
+        backend.remove_post(post_id)
+
+
+def rebuild(batch_size, post_model=Post, comment_model=Comment,
+            using=connection):
+    """Переиндексирует все посты и комментарии пачками по batch_size."""
+    backend = backend_for(using)
+    if backend is None:
+        return 0
+    backend.install()
+    backend.clear()
+    indexed = 0
+    sources = (
+        (POST, post_model.objects.values_list('pk', 'pk', 'text')),
+        (COMMENT, comment_model.objects.values_list('pk', 'post', 'text')),
+    )
+    for kind, rows in sources:
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk).order_by('pk')
+                         [:batch_size])
+            if not batch:
+                break
+            backend.index([(kind, pk, post_id, text)
+                           for pk, post_id, text in batch])
+            indexed += len(batch)
+            last_pk = batch[-1][0]
+    return indexed
+
+
+def clean_query(query):
+    """
+    Заменяет управляющие символы пробелами: на NUL FTS5 обрывает строку
+    запроса, а PostgreSQL не принимает его в тексте.
+    """
+    return ''.join(' ' if unicodedata.category(char) == 'Cc' else char
+                   for char in query).strip()
+
+
+class SearchResults:
+    """Ленивая выдача поиска, которую можно отдать в Paginator."""
+
+    def __init__(self, query):
+        self.query = clean_query(query)
+        self.backend = backend_for(connections[router.db_for_read(Post)])
+
+    def count(self):
+        if self.backend is None or not self.query:
+            return 0
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if self.backend is None or not self.query:
+            return []
+        post_ids = self.backend.search(self.query, key.start,
+                                       key.stop - key.start)
+        posts = (Post.objects.select_related('author', 'group')
+                 .in_bulk(post_ids))
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def search_posts(query):
+    return SearchResults(query)
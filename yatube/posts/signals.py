@@ -0,0 +1,191 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, counters, search, tasks, thumbnails, timeline
+from .object_cache import groups, users
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+USER_PAGE_FIELDS = {'username', 'first_name', 'last_name'}
+
+# Посты, удаляемые в этом потоке: их комментарии удаляются каскадом, и
+# счетчики, кэш и поиск по каждому из них не нужны.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def remember_tags(instance, tags_for):
+    old = type(instance).objects.filter(pk=instance.pk).first()
+    instance._old_cache_tags = tags_for(old) if old else []
+    instance._old_instance = old
+
+
+def versions(instance):
+    """Объект и его прежняя версия из pre_save, если она была."""
+    old = getattr(instance, '_old_instance', None)
+    return [instance] if old is None else [instance, old]
+
+
+def page_fields_changed(user):
+    """Изменились ли поля пользователя, которые видны на страницах."""
+    old = getattr(user, '_old_instance', None)
+    if old is None:
+        return False
+    return any(getattr(old, field) != getattr(user, field)
+               for field in USER_PAGE_FIELDS)
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, raw=False,
+                  **kwargs):
+    if raw or instance.pk is None:
+        return
+    if update_fields is None or USER_PAGE_FIELDS & set(update_fields):
+        remember_tags(instance, cache.user_tags)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if users.affected(update_fields):
+        users.invalidate(*versions(instance))
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif page_fields_changed(instance):
+        cache.forget_post_tags(*instance.posts.values_list('pk', flat=True))
+        cache.bump(*instance._old_cache_tags, *cache.user_tags(instance))
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        remember_tags(instance, cache.group_tags)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    groups.invalidate(*versions(instance))
+    if not created:
+        cache.forget_post_tags(*instance.posts.values_list('pk', flat=True))
+    cache.bump(*getattr(instance, '_old_cache_tags', []),
+               *cache.group_tags(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    cache.forget_post_tags(*instance.posts.values_list('pk', flat=True))
+    cache.bump(*cache.group_tags(instance))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    groups.invalidate(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    users.invalidate(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old = Post.objects.filter(pk=instance.pk).first()
+    if old is None:
+        return
+    instance._old_cache_tags = cache.post_tags(old)
+    if old.image.name != instance.image.name:
+        instance.thumbnails = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'text' in update_fields:
+        tasks.index_post.delay(instance.pk,
+                               key='index-post:{}'.format(instance.pk))
+    if created:
+        counters.change_stats(instance.author_id, 'posts_count')
+        tasks.fan_out.delay(instance.pk)
+    if instance.image and not instance.thumbnails:
+        thumbnails.schedule(instance.pk)
+    cache.forget_post_tags(instance.pk)
+    cache.bump(*getattr(instance, '_old_cache_tags', []),
+               *cache.post_tags(instance))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+    # Комментарии еще в базе: поиск чистится одним запросом по посту.
+    search.remove_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    counters.change_stats(instance.author_id, 'posts_count', -1)
+    cache.forget_post_tags(instance.pk)
+    cache.bump(*cache.post_tags(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False,
+                    update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'text' in update_fields:
+        tasks.index_comment.delay(
+            instance.pk, key='index-comment:{}'.format(instance.pk))
+    if created:
+        counters.change_comments(instance.post_id)
+        tasks.notify_comment.delay(instance.pk)
+        cache.bump(*cache.post_tags(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    search.remove(search.COMMENT, instance.pk)
+    counters.change_comments(instance.post_id, -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        cache.bump(*cache.post_tags(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_stats(instance.author_id, 'followers_count')
+        counters.change_stats(instance.user_id, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.bump(cache.author_tag(instance.author.username))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_stats(instance.author_id, 'followers_count', -1)
+    counters.change_stats(instance.user_id, 'following_count', -1)
+    timeline.trim(instance.user_id, instance.author_id)
+    if timeline.left_prolific(instance.author_id):
+        tasks.refill_feeds.delay(
+            instance.author_id,
+            key='refill-feeds:{}'.format(instance.author_id))
+    author = User.objects.filter(pk=instance.author_id).first()
+    if author is not None:
+        cache.bump(cache.author_tag(author.username))
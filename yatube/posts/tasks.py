@@ -0,0 +1,54 @@
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from jobs.queue import task
+
+from . import search, timeline
+from .models import Comment, Post
+
+
+@task(queue='search')
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('text').first()
+    if post is not None:
+        search.index_post(post)
+
+
+@task(queue='search')
+def index_comment(comment_id):
+    comment = (Comment.objects.filter(pk=comment_id)
+               .only('text', 'post').first())
+    if comment is not None:
+        search.index_comment(comment)
+
+
+@task(queue='feeds')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task(queue='feeds')
+def refill_feeds(author_id):
+    timeline.refill(author_id)
+
+
+@task(queue='mail')
+def notify_comment(comment_id):
+    """Письмо автору поста о новом комментарии."""
+    comment = (Comment.objects.select_related('author', 'post__author')
+               .filter(pk=comment_id).first())
+    if comment is None:
+        return
+    recipient = comment.post.author
+    if recipient == comment.author or not recipient.email:
+        return
+    send_mail(
+        'Новый комментарий к вашему посту',
+        '{} пишет: {}\n\n{}'.format(
+            comment.author.username, comment.text,
+            reverse('posts:post_detail', args=(comment.post_id,))),
+        None,
+        [recipient.email],
+    )
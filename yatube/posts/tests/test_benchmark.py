@@ -0,0 +1,45 @@
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import benchmark
+from ..models import FeedEntry, Post, UserStats
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(users=5, groups=2, posts=20, follows=10, comments=5,
+                       batch_size=7)
+
+    def test_seed_keeps_derived_data(self):
+        """Набор данных создается вместе со счетчиками и лентами."""
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 20)
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_run_reports_every_view(self):
+        """Отчет содержит задержки и число запросов по каждой странице."""
+        out = StringIO()
+        call_command('run_benchmark', clients=1, requests=3, warmup=0,
+                     stdout=out)
+
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results['views']), set(benchmark.VIEWS))
+        for view, result in results['views'].items():
+            with self.subTest(view=view):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_max'], 0)
+
+    def test_invalid_counts_rejected(self):
+        """Нулевое число запросов или клиентов - ошибка команды."""
+        for options in ({'requests': 0}, {'clients': 0}, {'warmup': -1}):
+            with self.subTest(**options):
+                with self.assertRaises(CommandError):
+                    call_command('run_benchmark', stdout=StringIO(),
+                                 **options)
@@ -0,0 +1,238 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import cache as page_cache
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @page_cache.cache_page_by_tags('group:{slug}', key_prefix='test')
+        def view(request, slug):
+            self.calls += 1
+            return HttpResponse(str(self.calls))
+
+        self.view = view
+        self.request = RequestFactory().get('/group/test/')
+        self.request.user = AnonymousUser()
+
+    def get(self):
+        return self.view(self.request, slug='test').content
+
+    def test_hit_after_miss(self):
+        """Повторный запрос отдается из кэша."""
+        self.assertEqual(self.get(), self.get())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(page_cache.stats()['hits'], 1)
+        self.assertEqual(page_cache.stats()['misses'], 1)
+
+    def test_stale_served_while_recomputing(self):
+        """Пока страницу пересчитывают, остальные получают старую копию."""
+        old_content = self.get()
+        page_cache.bump('group:test')
+        key = page_cache.page_key(self.request, 'test')
+        cache.add(page_cache.lock_key(key), 1)
+
+        self.assertEqual(self.get(), old_content)
+        self.assertEqual(page_cache.stats()['stale_served'], 1)
+
+        cache.delete(page_cache.lock_key(key))
+        self.assertNotEqual(self.get(), old_content)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_copy_keeps_old_etag(self):
+        """Старая копия не получает ETag новых версий тегов."""
+        view = page_cache.condition_by_tags('group:{slug}')(self.view)
+        etag = view(self.request, slug='test')['ETag']
+        page_cache.bump('group:test')
+        key = page_cache.page_key(self.request, 'test')
+        cache.add(page_cache.lock_key(key), 1)
+
+        stale = view(self.request, slug='test')
+        self.assertEqual(stale['ETag'], etag)
+        cache.delete(page_cache.lock_key(key))
+
+        request = RequestFactory().get('/group/test/',
+                                       HTTP_IF_NONE_MATCH=stale['ETag'])
+        request.user = AnonymousUser()
+        response = view(request, slug='test')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_entries_expire_by_default(self):
+        """По умолчанию запись страницы живет ограниченное время."""
+        self.get()
+
+        entry = cache.get(page_cache.page_key(self.request, 'test'))
+        self.assertIsNotNone(entry['expires'])
+
+    @override_settings(PAGE_CACHE_TIMEOUT=-1)
+    def test_expired_entry_recomputed(self):
+        """Истекшая запись пересчитывается."""
+        self.get()
+        self.get()
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(page_cache.stats()['stale'], 1)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(author=cls.user, text='тест',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def render_card(self, post):
+        return render_to_string('includes/post_card.html',
+                                {'post': post, 'show_group': True})
+
+    def test_card_rendered_from_cache(self):
+        """Карточка поста берется из кэша, пока пост не изменился."""
+        card = self.render_card(self.post)
+        Post.objects.filter(pk=self.post.pk).update(text='мимо сигналов')
+
+        self.assertEqual(self.render_card(Post.objects.get(pk=self.post.pk)),
+                         card)
+
+    def test_card_invalidated_on_edit(self):
+        """Редактирование поста сбрасывает кэш карточки."""
+        self.render_card(self.post)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'отредактирован'
+        post.save()
+
+        self.assertIn('отредактирован', self.render_card(post))
+
+    def test_card_invalidated_on_group_rename(self):
+        """Смена слага группы сбрасывает кэш карточек ее постов."""
+        self.render_card(self.post)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+
+        self.assertIn('/group/new-slug/',
+                      self.render_card(Post.objects.get(pk=self.post.pk)))
+
+    def test_card_invalidated_on_author_rename(self):
+        """Смена имени автора меняет карточки его постов."""
+        post = Post.objects.select_related('author').get(pk=self.post.pk)
+        render_to_string('includes/post_card.html',
+                         {'post': post, 'show_author': True})
+        post.author.first_name = 'Марио'
+        post.author.save()
+        post = Post.objects.select_related('author').get(pk=self.post.pk)
+
+        self.assertIn('Марио', render_to_string(
+            'includes/post_card.html', {'post': post, 'show_author': True}))
+
+    def test_card_invalidated_on_group_delete(self):
+        """После удаления группы карточка не ссылается на нее."""
+        self.render_card(self.post)
+        Group.objects.get(pk=self.group.pk).delete()
+
+        self.assertNotIn('/group/test-slug/',
+                         self.render_card(Post.objects.get(pk=self.post.pk)))
+
+    def test_password_change_keeps_posts(self):
+        """Смена пароля не трогает посты пользователя."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        user.save()
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(author=cls.user, text='тест',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдается как 304 без запросов к базе."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=('test-slug',)),
+            reverse('posts:profile', args=('mario',)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_detail_not_modified(self):
+        """Страница поста отвечает 304 без запросов, пока нет изменений."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_after_edit(self):
+        """Новый комментарий или пост меняют ETag страниц."""
+        detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+        group_url = reverse('posts:group_posts', args=('test-slug',))
+        detail_etag = self.client.get(detail_url)['ETag']
+        group_etag = self.client.get(group_url)['ETag']
+        self.post.comments.create(author=self.user, text='комментарий')
+        Post.objects.create(author=self.user, text='новый', group=self.group)
+
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(group_url, HTTP_IF_NONE_MATCH=group_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_changed_after_group_rename(self):
+        """Переименование группы меняет ETag страниц ее постов."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        self.group.slug = 'new-slug'
+        self.group.save()
+        etag_after_rename = self.client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='новый', group=self.group)
+
+        self.assertNotEqual(etag_after_rename, etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag_after_rename)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """У гостя и авторизованного пользователя разные ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
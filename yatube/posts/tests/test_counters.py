@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='mario')
+        cls.reader = User.objects.create_user(username='luigi')
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='тест')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='hi')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0)
+
+    def delete_queries(self, comments):
+        post = Post.objects.create(author=self.author, text='тест')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='hi %s' % number)
+            for number in range(comments))
+        with CaptureQueriesContext(connection) as context:
+            post.delete()
+        return len(context)
+
+    def test_post_delete_independent_of_comments(self):
+        """Удаление поста не делает запросов на каждый комментарий."""
+        self.assertEqual(self.delete_queries(30), self.delete_queries(1))
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0)
+
+    def test_post_delete_clears_search(self):
+        """Удаление поста убирает из поиска его комментарии."""
+        post = Post.objects.create(author=self.author, text='гриб')
+        Comment.objects.create(post=post, author=self.reader, text='гриб')
+        search.index_post(post)
+        search.index_comment(post.comments.get())
+        other = Post.objects.create(author=self.author, text='гриб')
+        search.index_post(other)
+
+        post.delete()
+
+        self.assertEqual(search.search_posts('гриб').count(), 1)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_counters пересчитывает разъехавшиеся счетчики."""
+        post = Post.objects.create(author=self.author, text='тест')
+        Comment.objects.create(post=post, author=self.reader, text='hi')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        UserStats.objects.filter(user=self.reader).delete()
+
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_profile_without_count_queries(self):
+        """Курсорная страница профиля не считает посты через COUNT."""
+        cache.clear()
+        Post.objects.create(author=self.author, text='тест')
+
+        with CaptureQueriesContext(connection) as context:
+            response = Client().get(
+                reverse('posts:profile', kwargs={'username': self.author}),
+                {'cursor': ''})
+
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertFalse([query for query in context.captured_queries
+                          if 'COUNT(' in query['sql']])
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.reader = User.objects.create_user(username='luigi')
+        cls.posts = [Post.objects.create(author=cls.user,
+                                         text='Пост %s' % number)
+                     for number in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def export(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('export', *args, stdout=stdout, stderr=stderr,
+                     **options)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return rows, json.loads(stderr.getvalue())
+
+    def test_ndjson(self):
+        """Выгрузка в NDJSON содержит все строки и отметку для следующей."""
+        rows, watermark = self.export('posts', chunk_size=2)
+
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['author'], 'mario')
+        self.assertEqual(watermark['rows'], 5)
+        self.assertEqual(watermark['id'], self.posts[-1].pk)
+
+        comments, _ = self.export('comments')
+        follows, _ = self.export('follows')
+        self.assertEqual(comments[0]['post'], self.posts[0].pk)
+        self.assertEqual(follows[0]['user'], 'luigi')
+
+    def test_incremental(self):
+        """С отметкой выгружаются только новые строки."""
+        _, watermark = self.export('posts')
+        new = Post.objects.create(author=self.user, text='Новый')
+
+        rows, _ = self.export('posts', since_id=watermark['id'])
+        self.assertEqual([row['id'] for row in rows], [new.pk])
+        rows, _ = self.export('posts', since=watermark['date'])
+        self.assertEqual([row['id'] for row in rows], [new.pk])
+
+    def test_incremental_with_edits(self):
+        """С обеими отметками выгружаются новые и отредактированные посты."""
+        _, watermark = self.export('posts')
+        edited = Post.objects.get(pk=self.posts[0].pk)
+        edited.text = 'Отредактирован'
+        edited.save()
+        new = Post.objects.create(author=self.user, text='Новый')
+
+        rows, _ = self.export('posts', since_id=watermark['id'],
+                              since=watermark['date'])
+        self.assertEqual([row['id'] for row in rows], [edited.pk, new.pk])
+
+    def test_shards(self):
+        """Части по диапазонам id вместе дают все строки ровно один раз."""
+        exported = []
+        for number in range(3):
+            rows, _ = self.export('posts', shard='{}/3'.format(number))
+            exported.extend(row['id'] for row in rows)
+
+        self.assertEqual(exported, [post.pk for post in self.posts])
+
+    def test_gzip_csv(self):
+        """Файл .gz сжимается, CSV начинается с заголовка."""
+        handle, path = tempfile.mkstemp(suffix='.csv.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export', 'follows', format='csv', output=path,
+                     stderr=StringIO())
+
+        with gzip.open(path, 'rt', encoding='utf-8') as source:
+            rows = list(csv.reader(source))
+        self.assertEqual(rows[0], ['id', 'user', 'author'])
+        self.assertEqual(rows[1][1:], ['luigi', 'mario'])
+
+    def test_admin_action(self):
+        """Действие админки отдает выбранные строки в CSV потоком."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'export_csv',
+             '_selected_action': [self.posts[1].pk, self.posts[2].pk]}
+        )
+
+        content = b''.join(response.streaming_content).decode()
+        ids = [row[0] for row in csv.reader(StringIO(content))]
+        self.assertEqual(ids, ['id', str(self.posts[1].pk),
+                               str(self.posts[2].pk)])
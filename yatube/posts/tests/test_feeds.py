@@ -0,0 +1,136 @@
+import json
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import enforce_query_budgets
+
+from ..models import Group, Post
+
+User = get_user_model()
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@enforce_query_budgets
+@override_settings(FEED_ITEMS=3)
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='peach')
+        cls.group = Group.objects.create(title='Замок', slug='castle',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text='Пост номер %s' % number)
+            for number in range(5)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode(), response
+
+    def test_formats(self):
+        """Ленты отдаются в Atom, RSS и JSON Feed."""
+        urls = (
+            reverse('posts:index_feed', args=('atom',)),
+            reverse('posts:group_feed', args=('castle', 'atom')),
+            reverse('posts:author_feed', args=('peach', 'atom')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                body, response = self.fetch(url)
+                root = ElementTree.fromstring(body)
+                entries = root.findall(ATOM + 'entry')
+                self.assertEqual(len(entries), 3)
+                self.assertEqual(entries[0].find(ATOM + 'summary').text,
+                                 self.posts[0].text)
+        body, response = self.fetch(reverse('posts:index_feed',
+                                            args=('rss',)))
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/rss+xml'))
+        items = ElementTree.fromstring(body).findall('channel/item')
+        self.assertEqual(len(items), 3)
+        body, response = self.fetch(reverse('posts:index_feed',
+                                            args=('json',)))
+        feed = json.loads(body)
+        self.assertEqual([item['content_text'] for item in feed['items']],
+                         [post.text for post in self.posts[:3]])
+
+    def test_next_page(self):
+        """Следующая страница ленты продолжает предыдущую по курсору."""
+        body, _ = self.fetch(reverse('posts:index_feed', args=('json',)))
+        next_url = json.loads(body)['next_url']
+        body, _ = self.fetch(next_url)
+        feed = json.loads(body)
+        self.assertEqual([item['content_text'] for item in feed['items']],
+                         [post.text for post in self.posts[3:]])
+        self.assertNotIn('next_url', feed)
+
+    def test_posts_read_before_streaming(self):
+        """Посты читаются во view, поток только сериализует их."""
+        response = self.client.get(reverse('posts:index_feed',
+                                           args=('json',)))
+
+        with CaptureQueriesContext(connection) as context:
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(context), 0)
+        self.assertEqual(len(json.loads(body)['items']), 3)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304, пока лента не менялась."""
+        url = reverse('posts:group_feed', args=('castle', 'atom'))
+        _, response = self.fetch(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        _, response = self.fetch(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_edit_and_delete(self):
+        """Правка и удаление поста сдвигают Last-Modified ленты."""
+        url = reverse('posts:group_feed', args=('castle', 'rss'))
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.update(updated=an_hour_ago)
+        _, response = self.fetch(url)
+        last_modified = response['Last-Modified']
+
+        Post.objects.filter(pk=self.posts[-1].pk).update(
+            updated=an_hour_ago + timedelta(minutes=1))
+        _, response = self.fetch(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        last_modified = response['Last-Modified']
+
+        self.posts[0].delete()
+        self.fetch(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+    def test_unknown(self):
+        """Неизвестный формат или группа дают 404."""
+        urls = (
+            reverse('posts:index_feed', args=('xml',)),
+            reverse('posts:group_feed', args=('nowhere', 'rss')),
+            reverse('posts:author_feed', args=('nobody', 'rss')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
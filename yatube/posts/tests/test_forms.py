@@ -7,6 +7,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.testing import enforce_query_budgets
+
 from ..forms import CommentForm, PostForm
 from ..models import Comment, Group, Post
 
@@ -14,6 +16,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+@enforce_query_budgets
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class FormsTest(TestCase):
     @classmethod
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import cache as page_cache
+from .. import importer
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='mario')
+        cls.reader = User.objects.create_user(username='luigi')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(title='Грибы', slug='mushrooms',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+
+    def run_import(self, content, suffix, batch_size=2):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w', encoding='utf-8') as target:
+            target.write(content)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_posts', path, batch_size=batch_size,
+                     stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_ndjson(self):
+        """Посты и комментарии из NDJSON попадают в базу, ленты и поиск."""
+        records = [
+            {'author': 'mario', 'text': 'Импорт один', 'group': 'mushrooms',
+             'pub_date': '2015-05-01T10:00:00'},
+            {'author': 'mario', 'text': 'Импорт два'},
+            {'author': 'mario', 'text': 'Импорт три'},
+            {'author': 'luigi', 'post': self.post.pk, 'text': 'Комментарий'},
+            {'author': 'nobody', 'text': 'Пропущен'},
+        ]
+        stdout, stderr = self.run_import(
+            '\n'.join(json.dumps(record) for record in records), '.ndjson')
+
+        self.assertIn('постов: 3, комментариев: 1', stdout)
+        self.assertIn('Строка 5', stderr)
+        imported = Post.objects.get(text='Импорт один')
+        self.assertEqual(imported.pub_date.year, 2015)
+        self.assertEqual(imported.group, self.group)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 4)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader,
+                                                 post=imported).exists())
+        response = self.client.get(reverse('posts:search'), {'q': 'импорт'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+
+    def test_csv(self):
+        """CSV читается по заголовку, пустые поля не считаются заданными."""
+        stdout, _ = self.run_import(
+            'author,text,group\n'
+            'mario,Из таблицы,\n'
+            'mario,С группой,mushrooms\n', '.csv')
+
+        self.assertIn('постов: 2', stdout)
+        self.assertIsNone(Post.objects.get(text='Из таблицы').group)
+
+    def test_bumps_page_cache(self):
+        """Импорт сдвигает версии тегов закэшированных страниц."""
+        before = page_cache.tag_versions(['group:mushrooms'])
+        self.run_import(json.dumps({'author': 'mario', 'text': 'Новый',
+                                    'group': 'mushrooms'}), '.ndjson')
+
+        self.assertNotEqual(page_cache.tag_versions(['group:mushrooms']),
+                            before)
+
+    def test_pks_refetched_without_sqlite(self):
+        """Без SQLite pk вставленных постов находятся по значениям полей."""
+        posts = [Post(author=self.author, text=text)
+                 for text in ('Первый', 'Второй', 'Первый')]
+        for post in posts:
+            post.legacy_date = None
+        Post.objects.create(author=self.reader, text='Чужой')
+
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            importer.insert(Post, posts, 'pub_date')
+
+        self.assertEqual(len({post.pk for post in posts}), 3)
+        for post in posts:
+            self.assertEqual(Post.objects.get(pk=post.pk).text, post.text)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Group
+from ..object_cache import groups, users
+
+User = get_user_model()
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Грибы', slug='mushrooms',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_lookup_without_queries(self):
+        """Повторный поиск группы не ходит в базу."""
+        groups.get('mushrooms')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get('mushrooms'), self.group)
+
+    def test_l2_serves_other_processes(self):
+        """Пустой L1 заполняется из общего кэша без запроса к базе."""
+        groups.get('mushrooms')
+        groups.l1.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get('mushrooms'), self.group)
+
+    def test_save_invalidates(self):
+        """Сохранение группы сбрасывает ее в кэше."""
+        groups.get('mushrooms')
+        self.group.title = 'Новое'
+        self.group.save()
+
+        self.assertEqual(groups.get('mushrooms').title, 'Новое')
+
+    def test_rename_invalidates_old_key(self):
+        """После переименования старое имя пользователя не находится."""
+        user = User.objects.create_user(username='mario')
+        users.get('mario')
+        user.username = 'luigi'
+        user.save()
+
+        with self.assertRaises(Http404):
+            users.get_or_404('mario')
+        self.assertEqual(users.get('luigi'), user)
+
+    def test_user_private_fields_not_cached(self):
+        """В общий кэш не попадают пароль и почта пользователя."""
+        User.objects.create_user(username='mario', email='mario@example.com',
+                                 password='secret', first_name='Марио')
+        users.get('mario')
+        cached = cache.get(users.key('mario'))
+
+        self.assertEqual(cached.first_name, 'Марио')
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('email', cached.__dict__)
+
+    def test_last_login_keeps_cache(self):
+        """Обновление last_login при входе не сбрасывает кэш."""
+        user = User.objects.create_user(username='mario')
+        users.get('mario')
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(users.get('mario'), user)
@@ -0,0 +1,141 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SCAN = re.compile(r'^SCAN ', re.IGNORECASE)
+INDEX_SCAN = re.compile(r'^SCAN \S+ USING (COVERING )?INDEX ', re.IGNORECASE)
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def unbounded_scan(sql, steps):
+    """
+    Шаги со сканом таблицы или всего индекса. Допустим только обход индекса
+    первым шагом запроса с LIMIT и без WHERE: каждая прочитанная строка
+    попадает на страницу, и обход останавливается на ее размере.
+    """
+    bounded = ' LIMIT ' in sql and ' WHERE ' not in sql
+    return [step for number, step in enumerate(steps)
+            if SCAN.search(step)
+            and not (bounded and number == 0 and INDEX_SCAN.search(step))]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.reader = User.objects.create_user(username='luigi')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='тест',
+            group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='hi')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        selects = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            steps = self.query_plan(sql)
+            with self.subTest(url=url, sql=sql, steps=steps):
+                self.assertEqual(unbounded_scan(sql, steps), [])
+                self.assertEqual(
+                    [step for step in steps if TEMP_SORT.search(step)], [])
+
+    def test_list_views_use_indexes(self):
+        """Запросы страниц не сканируют таблицы целиком и не сортируют."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=1',
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+
+        for url in urls:
+            self.assert_plans_use_indexes(url)
+
+    def test_cursor_pages_use_indexes(self):
+        """Курсорные страницы читаются по индексу."""
+        first_page = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user})
+        ).context['page_obj']
+        cursor = first_page.paginator.cursor_for(self.post)
+
+        self.assert_plans_use_indexes(
+            reverse('posts:profile', kwargs={'username': self.user})
+            + '?cursor=' + cursor)
+        self.assert_plans_use_indexes(
+            reverse('posts:index') + '?cursor=' + cursor)
+
+    def test_follow_cursor_page_uses_indexes(self):
+        """Курсорная страница ленты подписок читается по индексу."""
+        url = reverse('posts:follow_index')
+        page = self.client.get(url).context['page_obj']
+        cursor = page.paginator.cursor_for(page.object_list[0])
+
+        self.assert_plans_use_indexes(url + '?cursor=' + cursor)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_prolific_feed_uses_indexes(self):
+        """Лента с популярным автором читается по индексам без сортировки."""
+        regular = User.objects.create_user(username='yoshi')
+        Follow.objects.create(user=self.reader, author=regular)
+        Post.objects.create(author=regular, text='обычный')
+        url = reverse('posts:follow_index')
+        page = self.client.get(url).context['page_obj']
+        cursor = page.paginator.cursor_for(page.object_list[0])
+
+        self.assert_plans_use_indexes(url)
+        self.assert_plans_use_indexes(url + '?cursor=' + cursor)
+
+    def test_unbounded_scans_detected(self):
+        """Обход всего индекса и скан без LIMIT считаются полным сканом."""
+        self.assertTrue(unbounded_scan(
+            'SELECT COUNT(*) FROM posts_post',
+            ['SCAN posts_post USING COVERING INDEX post_updated_idx']))
+        self.assertTrue(unbounded_scan(
+            'SELECT * FROM posts_post ORDER BY pub_date',
+            ['SCAN posts_post USING INDEX post_date_idx']))
+        self.assertTrue(unbounded_scan(
+            'SELECT * FROM a, b LIMIT 10',
+            ['SEARCH a USING INDEX a_idx (x=?)',
+             'SCAN b USING INDEX b_idx']))
+        self.assertTrue(unbounded_scan(
+            'SELECT * FROM posts_post WHERE author_id IN (1, 2) '
+            'ORDER BY pub_date DESC LIMIT 10',
+            ['SCAN posts_post USING INDEX post_date_idx']))
+        self.assertFalse(unbounded_scan(
+            'SELECT * FROM posts_post ORDER BY pub_date DESC LIMIT 10',
+            ['SCAN posts_post USING INDEX post_date_idx']))
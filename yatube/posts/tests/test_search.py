@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import enforce_query_budgets
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@enforce_query_budgets
+@override_settings(TASKS_ALWAYS_EAGER=True)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.search_url = reverse('posts:search')
+
+    def found(self, query):
+        response = self.client.get(self.search_url, {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_finds_posts_and_comments(self):
+        """Поиск находит пост по его тексту и по тексту комментария."""
+        post = Post.objects.create(author=self.user,
+                                   text='Грибное королевство')
+        commented = Post.objects.create(author=self.user, text='Замок')
+        Comment.objects.create(post=commented, author=self.user,
+                               text='Принцесса в другом замке, гриб')
+        Post.objects.create(author=self.user, text='Черепахи')
+
+        self.assertEqual(self.found('грибное'), [post])
+        self.assertEqual(self.found('принцесса'), [commented])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении."""
+        post = Post.objects.create(author=self.user, text='Луиджи')
+        post.text = 'Марио'
+        post.save()
+
+        self.assertEqual(self.found('луиджи'), [])
+        self.assertEqual(self.found('марио'), [post])
+
+        post.delete()
+        self.assertEqual(self.found('марио'), [])
+
+    def test_ranked_and_paginated(self):
+        """Выдача разбита на страницы, точные совпадения выше."""
+        best = Post.objects.create(author=self.user, text='гриб гриб гриб')
+        Post.objects.bulk_create(
+            Post(author=self.user, text='гриб и много других слов %s' % n)
+            for n in range(settings.POSTS_PER_PAGE + 1)
+        )
+        call_command('rebuild_search_index', batch_size=3, stdout=StringIO())
+
+        first_page = self.found('гриб')
+        second_page = self.client.get(
+            self.search_url, {'q': 'гриб', 'page': 2}).context['page_obj']
+
+        self.assertEqual(first_page[0], best)
+        self.assertEqual(len(first_page), settings.POSTS_PER_PAGE)
+        self.assertEqual(len(second_page), 2)
+
+    def test_control_characters_ignored(self):
+        """NUL и другие управляющие символы в запросе не ломают поиск."""
+        post = Post.objects.create(author=self.user, text='Белый гриб')
+
+        self.assertEqual(self.found('гриб\x00'), [post])
+        for query in ('\x00', 'гриб\x00"', '\x1b[0m'):
+            with self.subTest(query=query):
+                response = self.client.get(self.search_url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_query_syntax_is_escaped(self):
+        """Служебные символы в запросе не ломают поиск."""
+        response = self.client.get(self.search_url, {'q': '"OR * ('})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_empty_result_message(self):
+        """Для запроса без результатов выводится сообщение."""
+        response = self.client.get(self.search_url, {'q': 'боузер'})
+        self.assertContains(response, 'Ничего не найдено.')
+
+        response = self.client.get(self.search_url)
+        self.assertNotContains(response, 'Ничего не найдено.')
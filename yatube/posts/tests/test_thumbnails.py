@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+
+from jobs.models import Job
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_ALWAYS_EAGER=True)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            author=self.user,
+            text='тест',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        )
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюры не готовы, карточка показывает заглушку."""
+        card = render_to_string('includes/post_card.html',
+                                {'post': self.post})
+
+        self.assertIn('thumbnail_placeholder.svg', card)
+
+    def test_generate_saves_urls(self):
+        """Миниатюры всех размеров сохраняются в посте."""
+        thumbnails.generate(self.post.pk)
+
+        self.post.refresh_from_db()
+        self.assertEqual(set(self.post.thumbnail_urls),
+                         set(settings.POST_THUMBNAILS))
+        self.assertIn(self.post.thumbnail_urls['card'],
+                      render_to_string('includes/post_card.html',
+                                       {'post': self.post}))
+
+    def test_new_image_resets_thumbnails(self):
+        """Новая картинка сбрасывает старые миниатюры."""
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.post.image = SimpleUploadedFile('other.gif', SMALL_GIF,
+                                             'image/gif')
+        self.post.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_urls, {})
+
+    def test_resolve_many_batches_lookups(self):
+        """Готовые миниатюры страницы находятся одним запросом к KV."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user,
+                text='тест',
+                image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+            )
+            for _ in range(2)
+        ]
+        for post in posts:
+            for geometry, options in settings.POST_THUMBNAILS.values():
+                get_thumbnail(post.image, geometry, **options)
+        cache.clear()
+        Post.objects.update(thumbnails='')
+        posts = list(Post.objects.all())
+
+        with self.assertNumQueries(1):
+            thumbnails.resolve_many(posts)
+
+        for post in posts:
+            self.assertEqual(set(post.thumbnail_urls),
+                             set(settings.POST_THUMBNAILS))
+        self.assertFalse(Post.objects.exclude(thumbnails='').exists())
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_generate_command(self):
+        """Команда ставит генерацию для постов без миниатюр."""
+        Post.objects.create(author=self.user, text='без картинки')
+        Job.objects.all().delete()
+
+        call_command('generate_thumbnails', stdout=StringIO())
+
+        self.assertEqual(
+            list(Job.objects.values_list('name', 'key')),
+            [(thumbnails.generate.task_name,
+              'thumbnails:{}'.format(self.post.pk))]
+        )
+
+    def test_resolve_many_skips_missing(self):
+        """Без готовых миниатюр пост остается с заглушкой."""
+        thumbnails.resolve_many([self.post])
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_urls, {})
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..models import FeedEntry, Follow, Post
+from ..timeline import feed_for
+from ..utils import CursorPaginator
+
+User = get_user_model()
+
+
+@override_settings(TASKS_ALWAYS_EAGER=True)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='mario')
+        cls.reader = User.objects.create_user(username='luigi')
+        cls.old_post = Post.objects.create(author=cls.author, text='старый')
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        self.assertIn(self.old_post, feed_for(self.reader))
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='новый')
+
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader,
+                                                 post=post).exists())
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertNotIn(self.old_post, feed_for(self.reader))
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_prolific_author_read_on_demand(self):
+        """Посты популярного автора читаются из ленты без раскладки."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='новый')
+
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertIn(post, feed_for(self.reader))
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_prolific_feed_pages(self):
+        """Лента с популярным автором листается по курсору без повторов."""
+        fan = User.objects.create_user(username='toad')
+        regular = User.objects.create_user(username='yoshi')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=regular)
+        for number in range(3):
+            Post.objects.create(author=self.author, text='p%s' % number)
+            Post.objects.create(author=regular, text='r%s' % number)
+        expected = list(Post.objects.filter(
+            author__in=[self.author, regular]).order_by('-pub_date', '-pk'))
+
+        paginator = CursorPaginator(feed_for(self.reader), 3,
+                                    field='feed_date',
+                                    tiebreaker='feed_post')
+        first = paginator.page(1)
+        rest = paginator.cursor_page(first.next_cursor)
+        last = paginator.cursor_page(rest.next_cursor)
+
+        self.assertEqual(paginator.count, len(expected))
+        self.assertEqual(
+            list(first) + list(rest) + list(last), expected)
+        self.assertFalse(last.has_next())
+        self.assertEqual(list(paginator.cursor_page(rest.previous_cursor)),
+                         list(first))
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_refill_after_leaving_prolific(self):
+        """Когда автор перестает быть популярным, его посты раскладываются."""
+        fan = User.objects.create_user(username='toad')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='без раскладки')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        Follow.objects.filter(user=fan).delete()
+
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader,
+                                                 post=post).exists())
+        self.assertIn(post, feed_for(self.reader))
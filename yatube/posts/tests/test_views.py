@@ -6,15 +6,22 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Follow, Group, Post
+from core.testing import enforce_query_budgets
+
+from ..models import Comment, Follow, Group, Post
+from ..utils import encode_cursor
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+@enforce_query_budgets
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
     @classmethod
@@ -219,6 +226,7 @@ class PostPagesTests(TestCase):
         self.assertNotIn(self.post, response.context['page_obj'])
 
 
+@enforce_query_budgets
 class PostPaginatorTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -243,6 +251,9 @@ class PostPaginatorTests(TestCase):
         cls.profile_url = reverse('posts:profile',
                                   kwargs={'username': cls.user})
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_ten_posts(self):
         """Проверка первой страницы Paginator."""
         pages_for_test = (
@@ -265,7 +276,58 @@ class PostPaginatorTests(TestCase):
             response = self.client.get(page)
             self.assertEqual(len(response.context['page_obj']), 3)
 
-
+    def test_cursor_pages(self):
+        """Курсорная пагинация листает вперед и назад без пропусков."""
+        first_page = self.client.get(self.index_url).context['page_obj']
+        next_cursor = first_page.next_cursor
+
+        second_page = self.client.get(
+            self.index_url, {'cursor': next_cursor}).context['page_obj']
+        back_page = self.client.get(
+            self.index_url,
+            {'cursor': second_page.previous_cursor}).context['page_obj']
+
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            set(first_page.object_list) | set(second_page.object_list),
+            set(Post.objects.all()))
+        self.assertEqual(back_page.object_list, first_page.object_list)
+        self.assertFalse(back_page.has_previous())
+
+    def test_broken_cursor_gives_first_page(self):
+        """Битый курсор отдает первую страницу."""
+        response = self.client.get(self.index_url, {'cursor': 'broken'})
+
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.POSTS_PER_PAGE)
+
+    def test_oversized_cursor_gives_first_page(self):
+        """Курсор с pk больше 64 бит отдает первую страницу, а не 500."""
+        cursor = encode_cursor(timezone.now(), 10 ** 26)
+        response = self.client.get(self.index_url, {'cursor': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.POSTS_PER_PAGE)
+
+    def test_first_page_without_count(self):
+        """Первая страница читается по ключу, без COUNT и OFFSET."""
+        for params in ({}, {'page': 1}):
+            with self.subTest(params=params):
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(self.index_url, params)
+                sql = ' '.join(query['sql']
+                               for query in context.captured_queries)
+
+                self.assertNotIn('COUNT(', sql)
+                self.assertNotIn('OFFSET', sql)
+                self.assertTrue(response.context['page_obj'].has_next())
+                self.assertFalse(response.context['page_obj'].has_previous())
+
+
+@enforce_query_budgets
 class IndexPageCacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -290,12 +352,12 @@ class IndexPageCacheTest(TestCase):
         content_before = (self.authorized_client.
                           get(reverse('posts:index')).content)
 
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='мимо сигналов')
 
         content_during = (self.authorized_client.
                           get(reverse('posts:index')).content)
 
-        cache.clear()
+        post.delete()
 
         content_after = (self.authorized_client.
                          get(reverse('posts:index')).content)
@@ -303,3 +365,96 @@ class IndexPageCacheTest(TestCase):
         self.assertEqual(content_before, content_during)
         self.assertNotEqual(content_during, content_after)
         self.assertNotIn(post, response.context['page_obj'])
+
+    def test_pages_cache_invalidated_by_tags(self):
+        """Изменения сбрасывают кэш только затронутых страниц."""
+        cache.clear()
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание'
+        )
+        group_url = reverse('posts:group_posts',
+                            kwargs={'slug': self.group.slug})
+        other_group_url = reverse('posts:group_posts',
+                                  kwargs={'slug': other_group.slug})
+        self.authorized_client.get(group_url)
+        self.authorized_client.get(other_group_url)
+
+        Post.objects.create(author=self.user, text='новый', group=self.group)
+
+        self.assertIsNotNone(
+            self.authorized_client.get(group_url).context)
+        self.assertIsNone(
+            self.authorized_client.get(other_group_url).context)
+
+
+@enforce_query_budgets
+class PostDetailCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mario')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый')
+        cls.post_detail_url = reverse('posts:post_detail',
+                                      kwargs={'post_id': cls.post.id})
+
+    def add_comments(self, count):
+        offset = User.objects.count()
+        readers = [
+            User.objects.create_user(username='reader%s' % (offset + number))
+            for number in range(count)
+        ]
+        for reader in readers:
+            Comment.objects.create(post=self.post, author=reader, text='hi')
+
+    def test_queries_do_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от комментариев."""
+        self.add_comments(2)
+        self.client.get(self.post_detail_url)
+        with self.assertNumQueries(2):
+            self.client.get(self.post_detail_url)
+
+        self.add_comments(5)
+        with self.assertNumQueries(2):
+            self.client.get(self.post_detail_url)
+
+    def test_comments_paginated(self):
+        """Комментарии выводятся страницами по курсору."""
+        self.add_comments(settings.COMMENTS_PER_PAGE + 2)
+
+        first_page = self.client.get(
+            self.post_detail_url).context['comments']
+        second_page = self.client.get(
+            self.post_detail_url,
+            {'cursor': first_page.next_cursor}).context['comments']
+
+        self.assertEqual(len(first_page), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(second_page.has_next())
+
+    def test_comments_fragment(self):
+        """Следующие комментарии отдаются фрагментом HTML и в JSON."""
+        self.add_comments(settings.COMMENTS_PER_PAGE + 2)
+        cursor = self.client.get(
+            self.post_detail_url).context['comments'].next_cursor
+        comments_url = reverse('posts:post_comments',
+                               kwargs={'post_id': self.post.id})
+
+        fragment = self.client.get(comments_url, {'cursor': cursor})
+        with self.assertNumQueries(1):
+            data = self.client.get(
+                comments_url, {'cursor': cursor, 'format': 'json'}).json()
+
+        self.assertTemplateUsed(fragment, 'includes/comment_page.html')
+        self.assertNotContains(fragment, '<html')
+        self.assertEqual(len(fragment.context['comments']), 2)
+        self.assertEqual(len(data['comments']), 2)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_comments_fragment_missing_post(self):
+        """Фрагмент комментариев несуществующего поста отдает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 404}))
+
+        self.assertEqual(response.status_code, 404)
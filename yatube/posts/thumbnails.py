@@ -0,0 +1,94 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from jobs.queue import task
+
+from . import cache
+from .models import Post
+
+
+@task(queue='thumbnails')
+def generate(post_id):
+    """Делает миниатюры всех размеров и сохраняет их адреса в посте."""
+    post = (Post.objects.select_related('author', 'group')
+            .filter(pk=post_id).first())
+    if post is None or not post.image:
+        return
+    urls = {
+        name: get_thumbnail(post.image, geometry, **options).url
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items()
+    }
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnails=json.dumps(urls)
+    )
+    if updated:
+        cache.bump(*cache.post_tags(post))
+
+
+def schedule(post_id):
+    transaction.on_commit(lambda: generate.delay(
+        post_id, key='thumbnails:{}'.format(post_id)))
+
+
+def thumbnail_file(image, geometry, options):
+    """Повторяет вычисление имени миниатюры из sorl без обращения к KV."""
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    source = ImageFile(image)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup_many(raw_keys):
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        values.update(KVStore.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+    return {key: value for key, value in values.items()
+            if value is not None and value != EMPTY_VALUE}
+
+
+def resolve_many(posts):
+    """
+    Находит готовые миниатюры для страницы постов одним get_many в кэше
+    и одним запросом к KV-хранилищу sorl. Адреса подставляются только в
+    объекты страницы: в базу их записывает задача generate, которую
+    ставит сохранение поста, так что чтение ничего не пишет.
+    """
+    if not hasattr(default.kvstore, 'cache'):
+        return
+    pending = [post for post in posts
+               if isinstance(post, Post) and post.image
+               and not post.thumbnail_urls]
+    if not pending:
+        return
+    raw_keys = {}
+    for post in pending:
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items():
+            thumbnail = thumbnail_file(post.image, geometry, options)
+            raw_keys[add_prefix(thumbnail.key)] = (post, name)
+    found = {}
+    for raw_key, value in lookup_many(list(raw_keys)).items():
+        post, name = raw_keys[raw_key]
+        found.setdefault(post, {})[name] = deserialize_image_file(value).url
+    for post in pending:
+        urls = found.get(post, {})
+        if len(urls) == len(settings.POST_THUMBNAILS):
+            post.thumbnails = json.dumps(urls)
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import FeedEntry, Follow, Post, UserStats
+from .utils import chunked
+
+
+def prolific_authors(user):
+    """Авторы, чьи посты не раскладываются по лентам при публикации."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('author', flat=True)
+
+
+def left_prolific(author_id):
+    """Автор только что опустился ниже FEED_FANOUT_LIMIT подписчиков."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_LIMIT - 1
+    ).exists()
+
+
+def fan_out(post):
+    if UserStats.objects.filter(
+        user_id=post.author_id,
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids),
+        ignore_conflicts=True
+    )
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: по запросу на авторов, подписки и вставку."""
+    author_ids = {post.author_id for post in posts}
+    prolific = set(UserStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+    follows = Follow.objects.filter(
+        author_id__in=author_ids - prolific).values_list('user_id',
+                                                         'author_id')
+    followers = defaultdict(list)
+    for user_id, author_id in follows:
+        followers[author_id].append(user_id)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for post in posts for user_id in followers[post.author_id]),
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', 'pub_date')
+             [:settings.FEED_BACKFILL_LIMIT])
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True
+    )
+
+
+def refill(author_id):
+    """
+    Раскладывает последние посты автора, переставшего быть популярным,
+    по лентам всех подписчиков: посты, вышедшие без раскладки, иначе
+    пропали бы из лент.
+    """
+    posts = list(Post.objects.filter(author_id=author_id)
+                 .values_list('pk', 'pub_date')
+                 [:settings.FEED_BACKFILL_LIMIT])
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_ids in chunked(follower_ids.iterator(), 100):
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+             for user_id in user_ids for post_id, pub_date in posts),
+            ignore_conflicts=True, batch_size=1000
+        )
+
+
+def trim(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+class MergedFeed:
+    """
+    Лента из нескольких querysets с общим порядком. Каждый читается по
+    своему индексу не дальше нужного среза, результаты сливаются в
+    памяти. Умеет то, что нужно CursorPaginator: сортировку в одном
+    направлении, фильтры, срезы и count.
+    """
+
+    def __init__(self, querysets, ordering=()):
+        self.querysets = querysets
+        self.ordering = ordering
+
+    def apply(self, method, *args, **kwargs):
+        return MergedFeed([getattr(queryset, method)(*args, **kwargs)
+                           for queryset in self.querysets], self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self.apply('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self.apply('select_related', *fields)
+
+    def order_by(self, *fields):
+        merged = self.apply('order_by', *fields)
+        merged.ordering = fields
+        return merged
+
+    def reverse(self):
+        merged = self.apply('reverse')
+        merged.ordering = tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        )
+        return merged
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        objects = []
+        for queryset in self.querysets:
+            objects.extend(queryset[:item.stop])
+        fields = [field.lstrip('-') for field in self.ordering]
+        objects.sort(
+            key=lambda obj: [getattr(obj, field) for field in fields],
+            reverse=bool(self.ordering) and self.ordering[0].startswith('-')
+        )
+        return objects[item]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def feed_for(user):
+    """
+    Лента подписок. Ключи пагинации feed_date и feed_post: записи ленты
+    читаются по индексу записей, посты каждого популярного автора - по
+    индексу его постов, и все сливается без прохода по общей ленте.
+    """
+    entries = Post.objects.filter(feed_entries__user=user).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post')
+    )
+    prolific = list(prolific_authors(user))
+    if not prolific:
+        return entries
+    return MergedFeed(
+        [entries.exclude(author__in=prolific)]
+        + [Post.objects.filter(author_id=author_id)
+           .annotate(feed_date=F('pub_date'), feed_post=F('pk'))
+           for author_id in prolific]
+    )
@@ -1,9 +1,149 @@
+import base64
+import binascii
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .thumbnails import resolve_many
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# pk в курсоре - знаковое 64-битное целое, как INTEGER SQLite и bigint.
+MAX_PK = 2 ** 63 - 1
+
+
+def chunked(objects, size):
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_cursor(value, pk, direction=NEXT):
+    raw = '{}|{}|{}'.format(direction, value.isoformat(), pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, значение, pk) или None для кривого курсора."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, value, pk = raw.split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or value is None:
+        return None
+    if not -MAX_PK - 1 <= pk <= MAX_PK:
+        return None
+    return direction, value, pk
+
+
+def cursor_page(object_list, paginator, next_cursor, previous_cursor):
+    """
+    Страница по курсору - обычный Page без номера, соседние страницы
+    известны по курсорам, поэтому COUNT не нужен.
+    """
+    page = Page(object_list, None, paginator)
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    page.has_next = lambda: next_cursor is not None
+    page.has_previous = lambda: previous_cursor is not None
+    return page
 
 
-def paginate(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+class CursorPaginator(Paginator):
+    """
+    Пагинатор по ключу (field, tiebreaker): страница по курсору отдается
+    одним запросом без COUNT и OFFSET. Номера страниц (?page=N) продолжают
+    работать как у обычного Paginator.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreaker='pk', **kwargs):
+        self.field = field
+        self.tiebreaker = tiebreaker
+        object_list = object_list.order_by('-' + field, '-' + tiebreaker)
+        super().__init__(object_list, per_page, **kwargs)
+
+    def cursor_for(self, obj, direction=NEXT):
+        return encode_cursor(getattr(obj, self.field),
+                             getattr(obj, self.tiebreaker), direction)
+
+    def page(self, number):
+        page = super().page(number)
+        objects = list(page.object_list)
+        page.object_list = objects
+        page.next_cursor = (
+            self.cursor_for(objects[-1]) if page.has_next() else None
+        )
+        return page
+
+    def keyset(self, cursor):
+        """Возвращает (queryset, направление, первая ли это страница)."""
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self.object_list, NEXT, True
+        direction, value, pk = decoded
+        if direction == NEXT:
+            queryset = self.object_list.filter(
+                Q(**{self.field + '__lt': value})
+                | Q(**{self.field: value, self.tiebreaker + '__lt': pk})
+            )
+        else:
+            queryset = self.object_list.filter(
+                Q(**{self.field + '__gt': value})
+                | Q(**{self.field: value, self.tiebreaker + '__gt': pk})
+            ).reverse()
+        return queryset, direction, False
+
+    def cursor_page(self, cursor):
+        queryset, direction, first = self.keyset(cursor)
+        return self._cursor_page(queryset, direction, first)
+
+    def _cursor_page(self, queryset, direction, first=False):
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == PREVIOUS:
+            objects.reverse()
+        if direction == NEXT:
+            has_next, has_previous = has_more, not first
+        else:
+            has_next, has_previous = True, has_more
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.cursor_for(objects[-1])
+        if objects and has_previous:
+            previous_cursor = self.cursor_for(objects[0], PREVIOUS)
+        return cursor_page(objects, self, next_cursor, previous_cursor)
+
+
+def paginate(request, post_list, per_page=None, field='pub_date',
+             tiebreaker='pk'):
+    paginator = CursorPaginator(post_list, per_page or settings.POSTS_PER_PAGE,
+                                field=field, tiebreaker=tiebreaker)
+    number = request.GET.get('page')
+    if number in (None, '', '1') or 'cursor' in request.GET:
+        # Первая страница тоже по ключу: без COUNT и OFFSET. Номера
+        # остаются для старых ссылок на ?page=N.
+        page_obj = paginator.cursor_page(request.GET.get('cursor'))
+    else:
+        page_obj = paginator.get_page(number)
+    resolve_many(page_obj.object_list)
     return page_obj
+
+
+def paginate_cursor(request, object_list, per_page, field, tiebreaker='pk'):
+    """Страница только по курсору: один запрос без COUNT."""
+    paginator = CursorPaginator(object_list, per_page, field=field,
+                                tiebreaker=tiebreaker)
+    return paginator.cursor_page(request.GET.get('cursor'))
@@ -1,13 +1,30 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
 
+from core.concurrency import gather
+from core.metrics import query_budget
+from core.replicas import read_replica
+
+from .cache import cache_page_by_tags, cached_post_tags, condition_by_tags
+from .counters import stats_for
+from .feeds import conditional_feed, feed_response
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginate
+from .models import Comment, Follow, Post
+from .object_cache import groups, users
+from .search import search_posts
+from .thumbnails import resolve_many
+from .timeline import feed_for
+from .utils import paginate, paginate_cursor
 
 
-@cache_page(20, key_prefix='index_page')
+@read_replica
+@query_budget(5)
+@condition_by_tags('index')
+@cache_page_by_tags('index', key_prefix='index_page')
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
     page_obj = paginate(request, post_list)
@@ -17,10 +34,17 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@read_replica
+@query_budget(6)
+@condition_by_tags('group:{slug}')
+@cache_page_by_tags('group:{slug}', key_prefix='group_page')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginate(request, post_list)
+    post_list = (Post.objects.filter(group__slug=slug)
+                 .select_related('author', 'group'))
+    group, page_obj = gather(
+        lambda: groups.get_or_404(slug),
+        lambda: paginate(request, post_list),
+    )
     context = {
         'page_obj': page_obj,
         'group': group
@@ -28,39 +52,136 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@read_replica
+@query_budget(8)
+@condition_by_tags('author:{username}')
+@cache_page_by_tags('author:{username}', key_prefix='profile_page')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_count = author.posts.count()
-    post_list = author.posts.all()
-    page_obj = paginate(request, post_list)
+    author = users.get_or_404(username)
+    post_list = author.posts.select_related('group')
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
-                                          author=author).exists()
+                                          author=author).exists
     else:
-        following = False
+        def following():
+            return False
+    stats, page_obj, following = gather(
+        lambda: stats_for(author),
+        lambda: paginate(request, post_list),
+        following,
+    )
     context = {
         'author': author,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
         'page_obj': page_obj,
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@read_replica
+@query_budget(4)
+@conditional_feed('index', Post.objects.all)
+def index_feed(request, fmt):
+    return feed_response(request, fmt, 'Последние обновления на сайте',
+                         reverse('posts:index'), Post.objects.all())
+
+
+@read_replica
+@query_budget(4)
+@conditional_feed('group:{slug}',
+                  lambda slug: Post.objects.filter(group__slug=slug))
+def group_feed(request, slug, fmt):
+    group = groups.get_or_404(slug)
+    return feed_response(request, fmt, group.title,
+                         reverse('posts:group_posts', args=(slug,)),
+                         Post.objects.filter(group=group))
+
+
+@read_replica
+@query_budget(4)
+@conditional_feed('author:{username}',
+                  lambda username: Post.objects.filter(
+                      author__username=username))
+def author_feed(request, username, fmt):
+    author = users.get_or_404(username)
+    return feed_response(request, fmt,
+                         'Записи пользователя {}'.format(author.username),
+                         reverse('posts:profile', args=(username,)),
+                         Post.objects.filter(author=author))
+
+
+def comments_page(request, post_id):
+    comments = (Comment.objects.filter(post_id=post_id)
+                .select_related('author')
+                .only('text', 'created', 'post', 'author__username'))
+    return paginate_cursor(request, comments, settings.COMMENTS_PER_PAGE,
+                           field='created')
+
+
+@read_replica
+@query_budget(7)
+@condition_by_tags(tags_for=cached_post_tags)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
-    comments = post.comments.all()
+    post, comments = gather(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'), pk=post_id
+        ),
+        lambda: comments_page(request, post_id),
+    )
+    resolve_many([post])
     form = CommentForm()
     context = {
         'post': post,
-        'posts_count': posts_count,
+        'posts_count': stats_for(post.author).posts_count,
         'comments': comments,
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_replica
+@query_budget(4)
+def post_comments(request, post_id):
+    comments = comments_page(request, post_id)
+    if (not comments.object_list
+            and not Post.objects.filter(pk=post_id).exists()):
+        raise Http404
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            } for comment in comments],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'comments': comments,
+        'post_id': post_id
+    }
+    return render(request, 'includes/comment_page.html', context)
+
+
+@read_replica
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(search_posts(query), settings.POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        resolve_many(page_obj.object_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(11)
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -75,6 +196,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(12)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -97,6 +219,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(10)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -109,19 +232,23 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+@read_replica
+@query_budget(6)
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate(request, post_list)
+    post_list = feed_for(request.user).select_related('author', 'group')
+    page_obj = paginate(request, post_list, field='feed_date',
+                        tiebreaker='feed_post')
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(10)
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     if (request.user == author
        or Follow.objects.filter(user=request.user, author=author).
        exists()):
@@ -130,8 +257,9 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(10)
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,53 @@
+"""
+Точка входа ASGI, например: uvicorn yatube.asgi:application.
+
+Django 2.2 обрабатывает запросы синхронно, поэтому приложение WSGI
+оборачивается адаптером asgiref: тело запроса читается сервером до того,
+как запрос займет поток, и медленный клиент не держит поток Django.
+Запросы выполняются в пуле из ASGI_THREADS потоков: стандартный адаптер
+запускает их в одном потоке, и процесс обслуживал бы запросы по одному.
+Независимые запросы к базе внутри страниц по умолчанию выполняются
+параллельно (CONCURRENT_QUERIES).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('CONCURRENT_QUERIES', '1')
+
+try:
+    from asgiref.sync import SyncToAsync
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+except ImportError:
+    raise ImproperlyConfigured(
+        'Для запуска через ASGI установите asgiref и сервер ASGI, '
+        'например: pip install asgiref uvicorn.'
+    )
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi, который выполняет запросы в своем пуле потоков."""
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        executor = ThreadPoolExecutor(max_workers=threads,
+                                      thread_name_prefix='asgi')
+
+        class Instance(WsgiToAsgiInstance):
+            run_wsgi_app = SyncToAsync(
+                WsgiToAsgiInstance.__dict__['run_wsgi_app'].func,
+                thread_sensitive=False, executor=executor)
+
+        self.instance_class = Instance
+
+    async def __call__(self, scope, receive, send):
+        await self.instance_class(self.wsgi_application)(scope, receive,
+                                                         send)
+
+
+application = ThreadedWsgiToAsgi(get_wsgi_application(),
+                                 settings.ASGI_THREADS)
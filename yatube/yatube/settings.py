@@ -15,10 +15,12 @@ ALLOWED_HOSTS = [
 
 
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'users',
-    'core',
+    'core.apps.CoreConfig',
     'about',
+    'api',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,6 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.db.DatabaseLimitMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +48,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,8 +68,14 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(os.getenv('DB_PGBOUNCER')),
     }
 }
 
@@ -100,6 +111,7 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_URL = '/static/'
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -112,8 +124,102 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# L2 общий для всех процессов. По умолчанию - файлы в CACHE_L2_LOCATION,
+# incr и add для них идут под flock на LOCK_FILE. Для нескольких хостов
+# задайте CACHE_L2_BACKEND с атомарными счетчиками, например
+# django.core.cache.backends.memcached.PyLibMCCache, - ему блокировка
+# не нужна.
+CACHE_L2_BACKEND = os.getenv(
+    'CACHE_L2_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHE_L2_LOCATION = os.getenv('CACHE_L2_LOCATION',
+                              os.path.join(BASE_DIR, 'cache'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        'BACKEND': 'core.caches.TwoLevelCache',
+        'OPTIONS': {
+            'L2': {
+                'BACKEND': CACHE_L2_BACKEND,
+                'LOCATION': CACHE_L2_LOCATION,
+            },
+            'LOCK_FILE': (
+                os.path.join(CACHE_L2_LOCATION, 'atomic.lock')
+                if CACHE_L2_BACKEND.endswith('.FileBasedCache') else None
+            ),
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'CHECK_INTERVAL': 0.5,
+            'SHARED_ONLY': ('tag-version:', 'page-cache-stats:',
+                            'object-generation:', 'lock:'),
+        },
     }
 }
+
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 1000
+FEED_ITEMS = 50
+
+# Свежесть страниц обеспечивают версии тегов; срок жизни лишь убирает
+# записи, к которым больше не обращаются (ключи по пользователям и курсорам).
+PAGE_CACHE_TIMEOUT = 300
+PAGE_CACHE_STALE_TIMEOUT = 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 2
+PAGE_CACHE_BETA = 1.0
+
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+QUERY_BUDGET_RAISE = False
+
+SEARCH_BACKEND = None
+SEARCH_CONFIG = 'russian'
+
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = 'replica{}'.format(number)
+    DATABASES[alias] = dict(DATABASES['default'], NAME=name,
+                            TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+REPLICA_MAX_LAG = 5
+
+# Сколько потоков одновременно работают с базой; это не число соединений.
+DB_ACTIVE_LIMIT = int(os.getenv('DB_ACTIVE_LIMIT', 0)) or None
+DB_ACTIVE_TIMEOUT = 5
+DB_HEALTH_CHECK_INTERVAL = 30
+
+OBJECT_CACHE_TIMEOUT = 3600
+OBJECT_CACHE_L1_TIMEOUT = 30
+OBJECT_CACHE_L1_MAX_ENTRIES = 1000
+OBJECT_CACHE_CHECK_INTERVAL = 1
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_MAX_BULK_ITEMS = 500
+
+# Задачи выполняет manage.py run_worker; тесты, которым нужны побочные
+# эффекты сразу, включают TASKS_ALWAYS_EAGER через override_settings.
+TASKS_ALWAYS_EAGER = False
+TASKS_MAX_ATTEMPTS = 3
+TASKS_RETRY_DELAY = 10
+TASKS_LOCK_TIMEOUT = 300
+TASKS_POLL_INTERVAL = 1
+TASKS_KEEP_DONE = 24 * 60 * 60
+TASKS_KEEP_FAILED = 7 * 24 * 60 * 60
+TASKS_PURGE_INTERVAL = 60 * 60
+TASKS_CONCURRENCY = {
+    'thumbnails': 2,
+    'mail': 1,
+}
+
+# Независимые запросы страниц профиля, группы и поста выполняются
+# параллельно в пуле потоков; каждому потоку нужно свое соединение с базой.
+# yatube.asgi включает это по умолчанию.
+CONCURRENT_QUERIES = bool(os.getenv('CONCURRENT_QUERIES'))
+CONCURRENT_QUERIES_WORKERS = 4
+
+# Сколько запросов процесс ASGI обрабатывает одновременно.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 10))